@@ -2,6 +2,7 @@
 from time import sleep
 from pidog import Pidog
 from pidog.walk import Walk
+from pidog.gait import splice_cycle
 import readchar
 import threading
 import os
@@ -37,14 +38,24 @@ thread_start = True
 
 
 def move_thread():
+    playing = current_coords
+    index = 0           # index in playing of the next frame
+    transition = []     # blended frames to play before playing[index]
     while thread_start:
-        for coord in current_coords:
-            # print(coord)
-            my_dog.set_rpy(**current_rpy, pid=True)
-            my_dog.set_pose(**current_pose)
-            my_dog.set_legs(coord)
-            angles = my_dog.pose2legs_angle()
-            my_dog.legs.servo_move(angles, speed=98)
+        if current_coords is not playing:
+            # continue the new gait at the current phase
+            transition, index = splice_cycle(playing, index, current_coords)
+            playing = current_coords
+        if transition:
+            coord = transition.pop(0)
+        else:
+            coord = playing[index]
+            index = (index + 1) % len(playing)
+        my_dog.set_rpy(**current_rpy, pid=True)
+        my_dog.set_pose(**current_pose)
+        my_dog.set_legs(coord)
+        angles = my_dog.pose2legs_angle()
+        my_dog.legs.servo_move(angles, speed=98)
 
 
 t = threading.Thread(target=move_thread)
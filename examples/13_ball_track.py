@@ -26,6 +26,7 @@ def ball_track():
     pitch = 0
     flag = False
     direction = 0
+    last_action = None
 
     my_dog.do_action('stand', speed=50)
     my_dog.head_move([[yaw, 0, pitch]], immediately=True, speed=80)
@@ -54,20 +55,22 @@ def ball_track():
 
         print(f"yaw: {yaw}, pitch: {pitch}, width: {width}")
 
-        my_dog.head_move([[yaw, 0, pitch]], immediately=True, speed=100)
+        my_dog.set_head_target([yaw, 0, pitch], speed=100)
         if width == 0:
             pitch = 0
             yaw = 0
         elif width < 300:
-            if my_dog.is_legs_done():
-                if yaw < -30:
-                    print("turn right")
-                    my_dog.do_action('turn_right', speed=98)
-                elif yaw > 30:
-                    print("turn left")
-                    my_dog.do_action('turn_left', speed=98)
-                else:
-                    my_dog.do_action('forward', speed=98)
+            if yaw < -30:
+                action = 'turn_right'
+            elif yaw > 30:
+                action = 'turn_left'
+            else:
+                action = 'forward'
+            # switch gait at the current phase instead of finishing the cycle
+            if my_dog.is_legs_done() or action != last_action:
+                print(action)
+                my_dog.do_action(action, speed=98, splice=True)
+                last_action = action
         sleep(0.02)
 
 
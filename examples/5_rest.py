@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 from pidog import Pidog
 from time import sleep
-from pidog.preset_actions import shake_head
+from pidog.preset_actions import shake_head, doze_off_smooth
 
 my_dog = Pidog()
 sleep(0.1)
@@ -35,14 +35,15 @@ def rest():
         # Sleeping
         my_dog.rgb_strip.set_mode('breath', 'pink', bps=0.3)
         my_dog.head_move([[0,0,-40]], immediately=True, speed=5)
-        my_dog.do_action('doze_off', speed=92)
+        doze_off_smooth(my_dog)
         # Cleanup sound detection
         sleep(1)
         is_sound()
 
         # keep sleeping
         while is_sound() is False:
-            my_dog.do_action('doze_off', speed=92)
+            if my_dog.is_legs_done():
+                doze_off_smooth(my_dog)
             sleep(0.2)
 
         # If heard anything, wake up
@@ -79,7 +79,7 @@ def face_track():
               end='\r',
               flush=True,
               )
-        my_dog.head_move([[yaw, 0, pitch]], pitch_comp=-40, immediately=True, speed=100)
+        my_dog.set_head_target([yaw, 0, pitch], pitch_comp=-40, speed=100)
         sleep(0.05)
 
 
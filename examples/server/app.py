@@ -58,6 +58,7 @@ CORS(app)
 
 import subprocess
 from pidog import preset_actions
+from pidog.actions_dictionary import ActionDict
 
 # Camera class for Pi Zero W (using picamera)
 class PiCameraStream:
@@ -211,6 +212,7 @@ except Exception as e:
 
 from pidog.preset_actions import pant, body_twisting, bark, shake_head, push_up, howling, bark_action
 from pidog.walk import Walk
+from pidog.gait import GaitRunner
 from math import sin
 
 class ExampleRunner:
@@ -917,6 +919,7 @@ class ExampleRunner:
             traceback.print_exc()
 
 example_runner = ExampleRunner()
+gait_runner = GaitRunner(my_dog)
 
 @app.route('/examples', methods=['GET'])
 def list_examples():
@@ -988,6 +991,9 @@ def action():
     speed = data.get('speed', 95)
     
     try:
+        # one-shot actions must not interleave with the continuous gait
+        gait_runner.stop()
+
         # Custom Action Logic
         if name == 'high_five':
             # Sit first to avoid falling
@@ -1023,12 +1029,22 @@ def action():
             return jsonify({"message": f"Preset action {name} triggered"})
         
         # Check standard actions
+        if name not in my_dog.actions_dict:
+            return jsonify({"error": f"Unknown action {name}"}), 400
         my_dog.do_action(name, speed=speed)
         return jsonify({"message": f"Action {name} triggered"})
     except Exception as e:
         print(f"Action error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/actions', methods=['GET'])
+def list_actions():
+    # Registered actions, see pidog/actions_dictionary.py
+    return jsonify([
+        {"name": info.name, "part": info.part, "static": info.static, "depends": list(info.depends)}
+        for info in ActionDict.ACTIONS.values()
+    ])
+
 @app.route('/move', methods=['POST'])
 def move():
     if example_runner.running:
@@ -1042,9 +1058,20 @@ def move():
     speed = data.get('speed', 95)
     
     try:
+        # Continuous teleop: {"velocity": mm/s, "turn_rate": deg/s, "step_height": mm, "cadence": Hz}
+        if 'velocity' in data or 'turn_rate' in data:
+            gait_runner.set_command(
+                velocity=data.get('velocity'),
+                turn_rate=data.get('turn_rate'),
+                step_height=data.get('step_height'),
+                cadence=data.get('cadence'))
+            gait_runner.start()
+            return jsonify({"message": "Gait command set"})
+
         # Map directions to actions
         # 12_app_control.py uses do_action for movement too
         if direction in ['forward', 'backward', 'turn_left', 'turn_right', 'trot', 'stop']:
+            gait_runner.stop()
             if direction == 'stop':
                 my_dog.body_stop()
             else:
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Offline-compiled action bank
+
+All ActionDict actions are evaluated once and written to a single binary file:
+
+    MAGIC | uint32 version | uint32 index length | index (json) | padding | float32 frames
+
+The index maps every action to its part, the parameter values it was generated
+with and the offset/shape of its frames. Pidog memory-maps the file at start,
+so the first command is as fast as the following ones and all processes
+running the robot share the same pages.
+
+Build (or rebuild after changing the library):
+
+    python3 -m pidog.action_bank [path]
+"""
+
+import os
+import sys
+import json
+import struct
+import numpy as np
+from .version import __version__
+
+MAGIC = b'PIDOGBNK'
+VERSION = 1
+ALIGN = 16
+HEADER = struct.Struct('<8sII')
+
+
+class ActionBank():
+
+    def __init__(self, path):
+        """
+            ActionBank init, memory-map a bank built by build_action_bank
+            path: bank file
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, index_len = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('%s is not a pidog action bank' % path)
+            index = json.loads(f.read(index_len).decode('utf-8'))
+        self.pidog_version = index['pidog_version']
+        data_offset = _aligned(HEADER.size + index_len)
+        self.data = np.memmap(path, dtype='<f4', mode='r', offset=data_offset)
+        # (name, *param values) -> (part, offset, shape)
+        self.index = {}
+        for entry in index['actions']:
+            key = tuple(entry['key'])
+            self.index[key] = (entry['part'], entry['offset'], tuple(entry['shape']))
+
+    def __contains__(self, key):
+        return tuple(key) in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, key):
+        """
+        Frames of an action
+
+        :param key: (name, *param values), see ActionDict
+        :type key: tuple
+        :return: (frames, part), frames is a read-only view of shape (N, width),
+                 None if the action is not in the bank
+        :rtype: tuple
+        """
+        entry = self.index.get(tuple(key))
+        if entry is None:
+            return None
+        part, offset, shape = entry
+        count = shape[0] * shape[1]
+        return self.data[offset:offset+count].reshape(shape), part
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def build_action_bank(path, action_dict=None):
+    """
+    Evaluate every registered action and write the bank
+
+    :param path: bank file to write
+    :type path: str
+    :param action_dict: ActionDict to evaluate, with its current height/barycenter,
+                        a default one if None
+    :type action_dict: ActionDict
+    :return: number of actions written
+    :rtype: int
+    """
+    from .actions_dictionary import ActionDict
+    if action_dict is None:
+        action_dict = ActionDict()
+
+    entries = []
+    blocks = []
+    offset = 0
+    for name, info in ActionDict.ACTIONS.items():
+        frames, part = info.fget(action_dict)
+        frames = np.asarray(frames, dtype='<f4')
+        key = [name] + [getattr(action_dict, param) for param in info.depends]
+        entries.append({'key': key, 'part': part,
+                        'offset': offset, 'shape': list(frames.shape)})
+        blocks.append(frames.ravel())
+        offset += frames.size
+
+    index = json.dumps({'pidog_version': __version__, 'actions': entries}).encode('utf-8')
+    header = HEADER.pack(MAGIC, VERSION, len(index))
+    padding = b'\0' * (_aligned(len(header) + len(index)) - len(header) - len(index))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(index)
+        f.write(padding)
+        for block in blocks:
+            f.write(block.tobytes())
+    os.replace(tmp, path)
+    return len(entries)
+
+
+if __name__ == '__main__':
+    from .pidog import action_bank_file
+    path = sys.argv[1] if len(sys.argv) > 1 else action_bank_file
+    count = build_action_bank(path)
+    print('%d actions written to %s' % (count, path))
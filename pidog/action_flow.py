@@ -1,4 +1,5 @@
 from .preset_actions import *
+from .actions_dictionary import ActionDict
 import threading
 import time
 from enum import Enum, StrEnum
@@ -281,3 +282,23 @@ class ActionFlow():
         self.thread_running = False
         if self.thread != None:
             self.thread.join()
+
+
+# posture the generated leg actions start from, the others (gaits) need stand
+LEG_ACTION_POSETURES = {
+    'sit': Posetures.SIT,
+    'half_sit': Posetures.SIT,
+    'lie': Posetures.LIE,
+    'lie_with_hands_out': Posetures.LIE,
+    'doze_off': Posetures.LIE,
+}
+
+def _do_action_operation(name):
+    operation = {"function": lambda self: self.dog_obj.do_action(name)}
+    if ActionDict.ACTIONS[name].part == 'legs':
+        operation["poseture"] = LEG_ACTION_POSETURES.get(name, Posetures.STAND)
+    return operation
+
+# every registered action can also be run by name, e.g. "tilting head left"
+for _name in ActionDict.list_actions():
+    ActionFlow.OPERATIONS.setdefault(_name.replace('_', ' '), _do_action_operation(_name))
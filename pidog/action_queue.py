@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Bounded ring queue of action frames
+
+Replaces the plain lists used as legs/head/tail action buffers. Frames are
+kept in a fixed size ring, so removing the oldest frame is O(1), and the
+action threads block on a condition variable until frames arrive instead of
+polling every millisecond.
+
+The queue lock is reentrant and is also exposed as Pidog.*_thread_lock, so
+several operations can be grouped atomically:
+
+    with queue.lock:
+        queue.truncate(1)
+        queue.extend(frames)
+
+Every frame gets a sequence number when queued. The action thread takes the
+oldest frame with begin() and calls task_done() once the servo write has
+finished, so a MotionHandle for a frame is done only when that frame and all
+the frames before it are written (or dropped by clear/truncate and not being
+written).
+"""
+
+import threading
+from time import monotonic
+
+
+class ActionQueue():
+
+    CAPACITY = 4096     # frames
+
+    def __init__(self, capacity=CAPACITY):
+        """
+            ActionQueue init
+            capacity: max frames queued, producers block when it is full
+        """
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._seqs = [0] * capacity
+        self._head = 0
+        self._count = 0
+        self._closed = False
+        self.next_seq = 0       # sequence number of the next queued frame
+        self.inflight = None    # sequence number of the frame being written
+        self.preempted = False  # the frame being written was superseded by set_target
+        self._callbacks = []    # (seq, fn)
+        # state of the part, shared with the writer
+        self.speed = 90         # speed of the frames, 0 ~ 100
+        self.current = None     # frame being or last written
+        self.positions = None   # servo positions, published by the motion scheduler
+        self.lock = threading.RLock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.changed = threading.Condition(self.lock)
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def __getitem__(self, index):
+        with self.lock:
+            if index < 0:
+                index += self._count
+            if not 0 <= index < self._count:
+                raise IndexError('ActionQueue index out of range')
+            return self._items[(self._head + index) % self.capacity]
+
+    def __iter__(self):
+        with self.lock:
+            return iter([self[i] for i in range(self._count)])
+
+    def __iadd__(self, frames):
+        self.extend(frames)
+        return self
+
+    def append(self, frame):
+        with self.lock:
+            while self._count >= self.capacity and not self._closed:
+                self.not_full.wait()
+            if self._count >= self.capacity:
+                # closed while full, the frame is dropped
+                return
+            i = (self._head + self._count) % self.capacity
+            self._items[i] = frame
+            self._seqs[i] = self.next_seq
+            self.next_seq += 1
+            self._count += 1
+            self.not_empty.notify_all()
+
+    def extend(self, frames):
+        with self.lock:
+            for frame in frames:
+                self.append(frame)
+
+    def clear(self):
+        self.truncate(0)
+
+    def truncate(self, count):
+        """
+        Keep only the first count frames
+        """
+        with self.lock:
+            while self._count > count:
+                self._count -= 1
+                self._items[(self._head + self._count) % self.capacity] = None
+            self.not_full.notify_all()
+            self._changed()
+
+    def peek(self, timeout=None):
+        """
+        Oldest frame without removing it, wait for one if empty
+
+        :param timeout: seconds to wait, None to wait until a frame arrives or
+                        the queue is closed
+        :type timeout: float
+        :return: the frame, None on timeout or if closed
+        """
+        with self.lock:
+            if not self.not_empty.wait_for(lambda: self._count > 0 or self._closed, timeout):
+                return None
+            if self._count == 0:
+                return None
+            return self._items[self._head]
+
+    def pop(self):
+        """
+        Remove and return the oldest frame, None if empty
+        """
+        with self.lock:
+            if self._count == 0:
+                return None
+            frame = self._items[self._head]
+            self._items[self._head] = None
+            self._head = (self._head + 1) % self.capacity
+            self._count -= 1
+            self.not_full.notify_all()
+            self._changed()
+            return frame
+
+    def get(self, timeout=None):
+        """
+        Remove and return the oldest frame, wait for one if empty, see peek
+        """
+        with self.lock:
+            if self.peek(timeout) is None:
+                return None
+            return self.pop()
+
+    # action thread side
+    def begin(self, timeout=None):
+        """
+        Take the oldest frame to write, it stays queued until task_done
+
+        :return: the frame, None on timeout or if closed
+        """
+        with self.lock:
+            frame = self.peek(timeout)
+            if frame is not None:
+                self.inflight = self._seqs[self._head]
+                self.preempted = False
+            return frame
+
+    def task_done(self):
+        """
+        The frame taken by begin is written, remove it unless it was dropped meanwhile
+        """
+        with self.lock:
+            if self._count > 0 and self._seqs[self._head] == self.inflight:
+                self.inflight = None
+                self.pop()
+            else:
+                self.inflight = None
+                self._changed()
+
+    def set_target(self, frame):
+        """
+        Latest wins: drop the queued frames not being written yet and queue
+        frame, never blocks. The frame being written is flagged as preempted,
+        a writer that can stop mid-move (the motion scheduler) moves on to
+        frame from where it is at the next tick.
+
+        :return: MotionHandle of frame
+        """
+        with self.lock:
+            writing = self.inflight is not None and self._count > 0 \
+                and self._seqs[self._head] == self.inflight
+            self.truncate(1 if writing else 0)
+            self.append(frame)
+            self.preempted = writing
+            return self.handle()
+
+    def take_preempted(self):
+        """
+        Whether the frame being written was preempted, clears the flag
+        """
+        with self.lock:
+            preempted = self.preempted
+            self.preempted = False
+            return preempted
+
+    # completion
+    def head_seq(self):
+        # sequence number of the oldest frame not written yet (queued)
+        with self.lock:
+            return self._seqs[self._head] if self._count > 0 else self.next_seq
+
+    def is_done(self, seq):
+        """
+        Whether the frame seq and all the frames before it are written
+        """
+        with self.lock:
+            if seq >= self.head_seq():
+                return False
+            return self.inflight is None or seq < self.inflight
+
+    def wait_done(self, seq, timeout=None):
+        """
+        Wait for is_done(seq)
+
+        :return: True if done, False on timeout
+        """
+        with self.lock:
+            return self.changed.wait_for(lambda: self.is_done(seq), timeout)
+
+    def add_done_callback(self, seq, fn):
+        """
+        Call fn() once is_done(seq), from the action thread, or right now if
+        already done. fn must be quick, it may be called with the queue lock held.
+        """
+        with self.lock:
+            if not self.is_done(seq):
+                self._callbacks.append((seq, fn))
+                return
+        fn()
+
+    def handle(self):
+        """
+        MotionHandle of the last queued frame
+        """
+        return MotionHandle(self, self.next_seq - 1)
+
+    def _changed(self):
+        self.changed.notify_all()
+        if self._callbacks:
+            ready = [fn for seq, fn in self._callbacks if self.is_done(seq)]
+            self._callbacks = [(seq, fn) for seq, fn in self._callbacks if not self.is_done(seq)]
+            for fn in ready:
+                fn()
+
+    def close(self):
+        """
+        Wake up all waiting threads, peek and get return None from now on
+        when the queue is empty
+        """
+        with self.lock:
+            self._closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+            self.changed.notify_all()
+
+    def open(self):
+        with self.lock:
+            self._closed = False
+
+
+class MotionHandle():
+    """
+    Completion of queued frames, returned by Pidog.legs_move, head_move,
+    tail_move and do_action
+    """
+
+    def __init__(self, queue, seq):
+        self.queue = queue
+        self.seq = seq
+
+    def done(self):
+        return self.queue.is_done(self.seq)
+
+    def wait(self, timeout=None):
+        """
+        Wait until the frames are written
+
+        :param timeout: seconds, None to wait forever
+        :type timeout: float
+        :return: True if done, False on timeout
+        :rtype: bool
+        """
+        return self.queue.wait_done(self.seq, timeout)
+
+    def add_done_callback(self, fn):
+        """
+        Call fn(handle) once done, see ActionQueue.add_done_callback
+        """
+        self.queue.add_done_callback(self.seq, lambda: fn(self))
+
+
+class MotionGroup():
+    """
+    Several handles combined, done when all of them are done,
+    e.g. MotionGroup([legs_handle, head_handle]).wait(2)
+    """
+
+    def __init__(self, handles):
+        self.handles = [h for h in handles if h is not None]
+
+    def done(self):
+        return all(h.done() for h in self.handles)
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else monotonic() + timeout
+        for h in self.handles:
+            remaining = None if deadline is None else max(0, deadline - monotonic())
+            if not h.wait(remaining):
+                return False
+        return True
+
+    def add_done_callback(self, fn):
+        if not self.handles:
+            fn(self)
+            return
+        pending = [len(self.handles)]
+        lock = threading.Lock()
+
+        def _one_done(handle):
+            with lock:
+                pending[0] -= 1
+                last = pending[0] == 0
+            if last:
+                fn(self)
+
+        for h in self.handles:
+            h.add_done_callback(_one_done)
@@ -1,31 +1,136 @@
 #!/usr/bin/env python3
+from collections import namedtuple
+import numpy as np
 from .pidog import Pidog
 from .walk import Walk
 from .trot import Trot
+from .action_bank import ActionBank
+from .version import __version__
 from math import sin
 
+# name: action name, part: 'legs', 'head' or 'tail',
+# static: frames never change, depends: parameters the frames depend on
+ActionInfo = namedtuple('ActionInfo', ['name', 'part', 'static', 'depends', 'fget'])
+
+_actions = {}
+
+
+def action(part, depends=()):
+    """
+    Register a method of ActionDict as an action
+
+    :param part: the part the frames are for, 'legs', 'head' or 'tail'
+    :type part: str
+    :param depends: ActionDict attributes the frames depend on, e.g. ('barycenter',)
+    :type depends: tuple
+    """
+    def decorator(fget):
+        depends_ = tuple(depends)
+        _actions[fget.__name__] = ActionInfo(
+            fget.__name__, part, not depends_, depends_, fget)
+        return property(fget)
+    return decorator
+
+
 # ActionDict: - > angles_dict
 class ActionDict(dict):
 
+    # registered actions, name -> ActionInfo
+    ACTIONS = _actions
+
     def __init__(self, *args, **kwargs):
         dict.__init__(self, *args, **kwargs)
         super().__init__()
         self.barycenter = -15
         self.height = 95
 
+        # generated frames, keyed by (name, *dependent parameter values)
+        self.cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bank_hits = 0
+        # precompiled frames, see action_bank.py
+        self.bank = None
+
     def __getitem__(self, item):
-        return eval("self.%s" % item.replace(" ", "_"))
+        info = self.ACTIONS[item.replace(" ", "_")]
+        key = (info.name,) + tuple(getattr(self, param) for param in info.depends)
+        if key in self.cache:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+            banked = self.bank.get(key) if self.bank is not None else None
+            if banked is not None:
+                self.bank_hits += 1
+                self.cache[key] = banked
+            else:
+                self.cache[key] = info.fget(self)
+        frames, part = self.cache[key]
+        # copy the frames, callers own the lists they get
+        if isinstance(frames, np.ndarray):
+            return frames.tolist(), part
+        return [list(frame) for frame in frames], part
+
+    def __contains__(self, item):
+        return item.replace(" ", "_") in self.ACTIONS
+
+    @classmethod
+    def list_actions(cls, part=None):
+        """
+        Names of the registered actions
+
+        :param part: only list actions for 'legs', 'head' or 'tail', all if None
+        :type part: str
+        :return: action names
+        :rtype: list
+        """
+        return [name for name, info in cls.ACTIONS.items()
+                if part is None or info.part == part]
+
+    def load_bank(self, path):
+        """
+        Use the frames of a bank built by action_bank.build_action_bank,
+        a bank built by another pidog version is ignored
+
+        :param path: bank file
+        :type path: str
+        :return: whether the bank is used
+        :rtype: bool
+        """
+        bank = ActionBank(path)
+        if bank.pidog_version != __version__:
+            return False
+        self.bank = bank
+        self.invalidate()
+        return True
+
+    def invalidate(self, param=None):
+        """
+        Drop cached frames depending on param, or all of them if param is None
+        """
+        if param is None:
+            self.cache.clear()
+            return
+        for key in list(self.cache):
+            if param in self.ACTIONS[key[0]].depends:
+                del self.cache[key]
+
+    def cache_info(self):
+        return {'hits': self.cache_hits, 'misses': self.cache_misses,
+                'bank_hits': self.bank_hits, 'size': len(self.cache)}
 
     def set_height(self, height):
-        if height in range(20, 95):
+        if height in range(20, 95) and height != self.height:
             self.height = height
+            self.invalidate('height')
 
     def set_barycenter(self, offset):
-        if offset in range(-60, 60):
+        if offset in range(-60, 60) and offset != self.barycenter:
             self.barycenter = offset
+            self.invalidate('barycenter')
 
     # 站 stand
-    @property
+    @action('legs', depends=('barycenter',))
     def stand(self):
         x = self.barycenter
         y = 95
@@ -35,85 +140,75 @@ class ActionDict(dict):
         ], 'legs'
 
     # 坐 sit
-    @property
+    @action('legs')
     def sit(self):
         return [
             [30, 60, -30, -60, 80, -45, -80, 45],
         ], 'legs'
 
     # 趴 lie
-    @property
+    @action('legs')
     def lie(self):
         return [
             [45, -45, -45, 45, 45, -45, -45, 45]
         ], 'legs'
 
     # 伸腿趴 lie_with_hands_out
-    @property
+    @action('legs')
     def lie_with_hands_out(self):
         return [
             [-60, 60, 60, -60, 45, -45, -45, 45],
         ], 'legs'
 
     # forward
-    @property
+    @action('legs')
     def forward(self):
-        data = []
         forward = Walk(fb=Walk.FORWARD, lr=Walk.STRAIGHT)
         coords = forward.get_coords()
-        for coord in coords:
-            data.append(Pidog.legs_angle_calculation(coord))
+        data = Pidog.legs_angle_calculation_batch(coords).tolist()
         return data, 'legs'
 
     # backward
-    @property
+    @action('legs')
     def backward(self):
-        data = []
         backward = Walk(fb=Walk.BACKWARD, lr=Walk.STRAIGHT)
         coords = backward.get_coords()
-        for coord in coords:
-            data.append(Pidog.legs_angle_calculation(coord))
+        data = Pidog.legs_angle_calculation_batch(coords).tolist()
         return data, 'legs'
 
     # turn_left
-    @property
+    @action('legs')
     def turn_left(self):
-        data = []
         turn_left = Walk(fb=Walk.FORWARD, lr=Walk.LEFT)
         coords = turn_left.get_coords()
-        for coord in coords:
-            data.append(Pidog.legs_angle_calculation(coord))
+        data = Pidog.legs_angle_calculation_batch(coords).tolist()
         return data, 'legs'
 
     # turn_right
-    @property
+    @action('legs')
     def turn_right(self):
-        data = []
         turn_right = Walk(fb=Walk.FORWARD, lr=Walk.RIGHT)
         coords = turn_right.get_coords()
-        for coord in coords:
-            data.append(Pidog.legs_angle_calculation(coord))
+        data = Pidog.legs_angle_calculation_batch(coords).tolist()
         return data, 'legs'
 
     # 小跑 trot
-    @property
+    @action('legs')
     def trot(self):
-        data = []
         trot = Trot(Trot.FORWARD, Trot.STRAIGHT)
         coords = trot.get_coords()
-        for coord in coords:
-            data.append(Pidog.legs_angle_calculation(coord))
+        data = Pidog.legs_angle_calculation_batch(coords).tolist()
         return data, 'legs'
 
     # 伸懒腰 stretch
-    @property
+    @action('legs')
     def stretch(self):
         return [
             [-80, 70, 80, -70, -20, 64, 20, -64],
         ], 'legs'
 
     # 俯卧撑 push_up
-    @property
+    @action('legs')
     def push_up(self):
         return [
             [90, -30, -90, 30, 80, 70, -80, -70],
@@ -121,7 +216,7 @@ class ActionDict(dict):
         ], 'legs'
 
     # 打瞌睡 doze_off
-    @property
+    @action('legs')
     def doze_off(self):
         start = -30
         am = 20
@@ -153,7 +248,7 @@ class ActionDict(dict):
         return angs, 'legs'
 
     # 点头昏睡 nod_lethargy
-    @property
+    @action('head')
     def nod_lethargy(self):
         y = 0
         r = 0
@@ -170,7 +265,7 @@ class ActionDict(dict):
         return angs, 'head'
 
     # 摇头 shake_head
-    @property
+    @action('head')
     def shake_head(self):
         amplitude = 60
         angs = []
@@ -181,7 +276,7 @@ class ActionDict(dict):
         return angs, 'head'
 
     # 左歪头 tilting_head_left
-    @property
+    @action('head')
     def tilting_head_left(self):
         yaw = 0
         roll = -25
@@ -191,7 +286,7 @@ class ActionDict(dict):
         ], 'head'
 
     # 右歪头 tilting_head_right
-    @property
+    @action('head')
     def tilting_head_right(self):
         yaw = 0
         roll = 25
@@ -201,7 +296,7 @@ class ActionDict(dict):
         ], 'head'
 
     # 左右歪头 tilting_head left and right
-    @property
+    @action('head')
     def tilting_head(self):
         yaw = 0
         roll = 22
@@ -210,7 +305,7 @@ class ActionDict(dict):
             + [[yaw, -roll, pitch]]*20, 'head'
 
     # 仰头吠叫 head_bark
-    @property
+    @action('head')
     def head_bark(self):
         return [[0, 0, -40],
                 [0, 0, -10],
@@ -219,7 +314,7 @@ class ActionDict(dict):
                 ], 'head'
 
     # 摇尾巴 wag_tail
-    @property
+    @action('tail')
     def wag_tail(self):
         # amplitude = 50
         # angs = []
@@ -230,7 +325,7 @@ class ActionDict(dict):
         return angs, 'tail'
 
     # head_up_down
-    @property
+    @action('head')
     def head_up_down(self):
         # amplitude = 20
         # angs = []
@@ -249,7 +344,7 @@ class ActionDict(dict):
         ], 'head'
 
     # half_sit
-    @property
+    @action('legs')
     def half_sit(self):
         return [
             [25, 25, -25, -25, 64, -45, -64, 45],
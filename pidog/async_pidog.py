@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+asyncio facade of Pidog
+
+AsyncPidog wraps a Pidog for asyncio applications (web control, voice
+assistants) without extra threads and without blocking the event loop:
+
+    motions:  legs_move, head_move, tail_move, do_action ... queue the frames
+              like Pidog and return a coroutine that completes when they are
+              written. With immediately=True the stop of the part, which waits
+              for the frame being written, runs in the default executor. The
+              MotionHandle of the frames wakes the event loop through
+              call_soon_threadsafe, completion is not polled. Cancelling the
+              coroutine (task.cancel(), asyncio.wait_for timeout) stops the
+              part: legs_stop, head_stop or tail_stop, body_stop for
+              wait_all_done.
+    sensors:  distance, imu and touch are async generators reading the sensor
+              every period with asyncio.sleep in between, e.g.
+
+                  async for distance in dog.distance():
+                      ...
+
+Any other attribute is the one of the wrapped Pidog, so the synchronous API
+stays available.
+
+    async def main():
+        async with AsyncPidog() as dog:
+            await dog.do_action('stand', speed=80)
+            await asyncio.wait_for(dog.do_action('forward', step_count=10), 3)
+"""
+
+import asyncio
+from collections import namedtuple
+from functools import partial
+from .pidog import Pidog
+from .action_queue import MotionGroup
+from .actions_dictionary import ActionDict
+from .trajectory import Trajectory
+
+ImuSample = namedtuple('ImuSample', ['acc', 'gyro', 'pitch', 'roll'])
+
+
+class AsyncPidog():
+
+    DISTANCE_PERIOD = 0.05  # s
+    TOUCH_PERIOD = 0.02     # s
+
+    def __init__(self, dog=None, **kwargs):
+        """
+            AsyncPidog init
+            dog: Pidog to wrap, a new Pidog(**kwargs) if None
+        """
+        self.dog = Pidog(**kwargs) if dog is None else dog
+
+    def __getattr__(self, name):
+        return getattr(self.dog, name)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _run(self, fn, *args, **kwargs):
+        # blocking Pidog call in the default executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(fn, *args, **kwargs))
+
+    def _stop(self, part):
+        return {'legs': self.dog.legs_stop, 'head': self.dog.head_stop,
+                'tail': self.dog.tail_stop}.get(part, self.dog.body_stop)
+
+    async def wait(self, handle, stop=None):
+        '''
+        Wait for a MotionHandle or MotionGroup
+
+        :param handle: handle returned by Pidog, None is done
+        :param stop: blocking function called when the wait is cancelled,
+                     e.g. Pidog.body_stop, None for none
+        :return: True
+        '''
+        if handle is None:
+            return True
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def _set_result(_):
+            if not future.done():
+                future.set_result(True)
+
+        # called from the action thread, or right now if already done
+        handle.add_done_callback(lambda h: loop.call_soon_threadsafe(_set_result, h))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if stop is not None:
+                await self._run(stop)
+            raise
+
+    async def _move(self, move, stop, immediately, *args, **kwargs):
+        # the stop waits for the frame being written, not on the event loop
+        if immediately:
+            await self._run(stop)
+        handle = move(*args, immediately=False, **kwargs)
+        return await self.wait(handle, stop)
+
+    # motions
+    async def legs_move(self, target_angles, immediately=True, speed=50):
+        return await self._move(self.dog.legs_move, self.dog.legs_stop, immediately,
+                                target_angles, speed=speed)
+
+    async def head_move(self, target_yrps, roll_comp=0, pitch_comp=0, immediately=True, speed=50):
+        return await self._move(self.dog.head_move, self.dog.head_stop, immediately,
+                                target_yrps, roll_comp=roll_comp, pitch_comp=pitch_comp, speed=speed)
+
+    async def head_move_raw(self, target_angles, immediately=True, speed=50):
+        return await self._move(self.dog.head_move_raw, self.dog.head_stop, immediately,
+                                target_angles, speed=speed)
+
+    async def tail_move(self, target_angles, immediately=True, speed=50):
+        return await self._move(self.dog.tail_move, self.dog.tail_stop, immediately,
+                                target_angles, speed=speed)
+
+    async def do_action(self, action_name, step_count=1, speed=50, pitch_comp=0, splice=False):
+        '''
+        Pidog.do_action, completes when the action is played
+
+        :return: True, None if the action could not be queued
+        '''
+        handle = self.dog.do_action(action_name, step_count=step_count, speed=speed,
+                                    pitch_comp=pitch_comp, splice=splice)
+        if handle is None:
+            return None
+        return await self.wait(handle, self._stop(ActionDict.ACTIONS[action_name].part))
+
+    async def trajectory_move(self, part, keyframes, times, method=Trajectory.CUBIC, immediately=True):
+        if part not in ('legs', 'head', 'tail'):
+            raise ValueError("part must be 'legs', 'head' or 'tail'")
+        return await self._move(self.dog.trajectory_move, self._stop(part), immediately,
+                                part, keyframes, times, method=method)
+
+    async def wait_legs_done(self):
+        return await self.wait(self.dog.legs_action_buffer.handle(), self.dog.legs_stop)
+
+    async def wait_head_done(self):
+        return await self.wait(self.dog.head_action_buffer.handle(), self.dog.head_stop)
+
+    async def wait_tail_done(self):
+        return await self.wait(self.dog.tail_action_buffer.handle(), self.dog.tail_stop)
+
+    async def wait_all_done(self):
+        return await self.wait(MotionGroup([self.dog.legs_action_buffer.handle(),
+                                            self.dog.head_action_buffer.handle(),
+                                            self.dog.tail_action_buffer.handle()]),
+                               self.dog.body_stop)
+
+    async def body_stop(self):
+        await self._run(self.dog.body_stop)
+
+    async def stop_and_lie(self, speed=85):
+        await self._run(self.dog.stop_and_lie, speed)
+
+    async def speak(self, name, volume=100):
+        '''
+        Play a sound and wait until it ends, see Pidog.speak_block
+        '''
+        return await self._run(self.dog.speak_block, name, volume)
+
+    async def close(self):
+        await self._run(self.dog.close)
+
+    # sensors
+    async def distance(self, period=DISTANCE_PERIOD):
+        '''
+        Ultrasonic distance stream
+
+        :param period: seconds between readings
+        :type period: float
+        :return: async generator of distances in cm, -1 when nothing is read
+        '''
+        while True:
+            yield self.dog.read_distance()
+            await asyncio.sleep(period)
+
+    async def imu(self, period=Pidog.IMU_PERIOD):
+        '''
+        IMU stream, the latest values of the IMU thread every period, use
+        Pidog.imu_ring for every sample
+
+        :param period: seconds between readings
+        :type period: float
+        :return: async generator of ImuSample(acc, gyro, pitch, roll), raw
+                 accelerometer and gyroscope values, pitch and roll in degree
+        '''
+        while True:
+            dog = self.dog
+            yield ImuSample(list(dog.accData), list(dog.gyroData), dog.pitch, dog.roll)
+            await asyncio.sleep(period)
+
+    async def touch(self, period=TOUCH_PERIOD):
+        '''
+        Head touch stream, only touches are yielded, see DualTouch.read
+
+        :param period: seconds between readings
+        :type period: float
+        :return: async generator of 'L', 'R', 'LS' or 'RS'
+        '''
+        last = 'N'
+        while True:
+            touch = self.dog.dual_touch.read()
+            if touch != 'N' and touch != last:
+                yield touch
+            last = touch
+            await asyncio.sleep(period)
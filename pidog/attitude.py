@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Attitude estimation from the accelerometer and the gyroscope
+
+The accelerometer alone gives pitch and roll only when the body is not
+accelerating; while walking it is dominated by the foot impacts. The gyro
+is smooth but drifts. MahonyFilter fuses both: the attitude quaternion is
+integrated from the gyro and pulled toward the accelerometer gravity
+direction with a PI feedback, which also estimates the gyro bias. Samples
+whose acceleration is far from 1 g (impacts, jumps) do not correct it.
+
+Body frame, with the SH3001 raw axes (see sensor2body):
+
+    x: forward = ay,  y: left = -az,  z: up = -ax
+
+pitch and roll follow the conventions of the accelerometer only estimate of
+Pidog (same values at rest), yaw is the integrated heading, it drifts.
+
+The filter has no hardware dependency, run it offline over logged samples
+with MahonyFilter.run.
+"""
+
+from collections import namedtuple
+from math import sqrt, atan2, radians, degrees
+
+ACC_SCALE = 16384   # LSB / g, +-2 g range
+GYRO_SCALE = 16.384  # LSB / (degree/s), +-2000 dps range
+
+Attitude = namedtuple('Attitude', ['timestamp', 'pitch', 'roll', 'yaw'])
+
+
+def sensor2body(acc, gyro):
+    """
+    Raw SH3001 readings to the body frame
+
+    acc, gyro: [x, y, z] raw values, offsets applied
+    return: (acc in g, gyro in degree/s), body frame
+    """
+    ax, ay, az = acc
+    gx, gy, gz = gyro
+    return ([ay / ACC_SCALE, -az / ACC_SCALE, -ax / ACC_SCALE],
+            [gy / GYRO_SCALE, -gz / GYRO_SCALE, -gx / GYRO_SCALE])
+
+
+class MahonyFilter():
+
+    KP = 1.0            # 1/s, accelerometer correction
+    KI = 0.05           # 1/s^2, gyro bias estimation
+    ACC_TOLERANCE = 0.3  # g, accelerometer used only within 1 g +- ACC_TOLERANCE
+
+    def __init__(self, kp=KP, ki=KI, acc_tolerance=ACC_TOLERANCE):
+        """
+            MahonyFilter init
+            kp: proportional gain of the accelerometer correction, higher
+                follows the accelerometer faster
+            ki: integral gain, gyro bias estimation, 0 to disable
+            acc_tolerance: g, the accelerometer is ignored when its norm is
+                           farther than this from 1 g
+        """
+        self.kp = kp
+        self.ki = ki
+        self.acc_tolerance = acc_tolerance
+        self.reset()
+
+    def reset(self, acc=None):
+        """
+        Level attitude, or the attitude given by acc (body frame) with zero yaw
+        """
+        self.q = [1.0, 0.0, 0.0, 0.0]
+        self.bias = [0.0, 0.0, 0.0]     # rad/s
+        self.timestamp = None
+        if acc is not None:
+            norm = sqrt(sum(a * a for a in acc))
+            if norm > 0:
+                ax, ay, az = (a / norm for a in acc)
+                # shortest rotation from up (0, 0, 1) to the measured gravity direction
+                w = 1 + az
+                if w < 1e-9:
+                    self.q = [0.0, 1.0, 0.0, 0.0]
+                else:
+                    # q rotates body vectors to the world frame: conjugate of up -> acc
+                    n = sqrt(w * w + ax * ax + ay * ay)
+                    self.q = [w / n, ay / n, -ax / n, 0.0]
+
+    def gravity(self):
+        # up direction of the world in the body frame
+        q0, q1, q2, q3 = self.q
+        return (2 * (q1 * q3 - q0 * q2),
+                2 * (q0 * q1 + q2 * q3),
+                q0 * q0 - q1 * q1 - q2 * q2 + q3 * q3)
+
+    def update(self, acc, gyro, dt, timestamp=None):
+        """
+        Advance the estimate by one sample
+
+        acc: [x, y, z] body frame, any unit scaled to g (see sensor2body)
+        gyro: [x, y, z] body frame, degree/s
+        dt: seconds since the previous sample
+        timestamp: time of the sample, stored in the result
+        return: Attitude
+        """
+        gx, gy, gz = (radians(g) for g in gyro)
+        ax, ay, az = acc
+        norm = sqrt(ax * ax + ay * ay + az * az)
+        if norm > 0 and abs(norm - 1) <= self.acc_tolerance:
+            ax, ay, az = ax / norm, ay / norm, az / norm
+            vx, vy, vz = self.gravity()
+            # error between the measured and estimated gravity directions
+            ex = ay * vz - az * vy
+            ey = az * vx - ax * vz
+            ez = ax * vy - ay * vx
+            if self.ki > 0:
+                self.bias[0] += self.ki * ex * dt
+                self.bias[1] += self.ki * ey * dt
+                self.bias[2] += self.ki * ez * dt
+            gx += self.kp * ex + self.bias[0]
+            gy += self.kp * ey + self.bias[1]
+            gz += self.kp * ez + self.bias[2]
+        else:
+            gx += self.bias[0]
+            gy += self.bias[1]
+            gz += self.bias[2]
+
+        # q' = q + q * (0, w) * dt / 2
+        q0, q1, q2, q3 = self.q
+        h = 0.5 * dt
+        q0, q1, q2, q3 = (q0 + (-q1 * gx - q2 * gy - q3 * gz) * h,
+                          q1 + (q0 * gx + q2 * gz - q3 * gy) * h,
+                          q2 + (q0 * gy - q1 * gz + q3 * gx) * h,
+                          q3 + (q0 * gz + q1 * gy - q2 * gx) * h)
+        norm = sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+        self.q = [q0 / norm, q1 / norm, q2 / norm, q3 / norm]
+        self.timestamp = timestamp
+        return self.attitude()
+
+    def attitude(self):
+        """
+        :return: Attitude of the last update, angles in degree
+        """
+        vx, vy, vz = self.gravity()
+        q0, q1, q2, q3 = self.q
+        # same formulas as the accelerometer only estimate, on the estimated gravity
+        pitch = degrees(atan2(-vx, sqrt(vy * vy + vz * vz)))
+        roll = degrees(atan2(vy, sqrt(vx * vx + vz * vz)))
+        yaw = degrees(atan2(2 * (q0 * q3 + q1 * q2), 1 - 2 * (q2 * q2 + q3 * q3)))
+        return Attitude(self.timestamp, pitch, roll, yaw)
+
+    def run(self, samples, raw=True):
+        """
+        Filter logged samples, offline
+
+        samples: iterable of (timestamp, acc, gyro), timestamps in seconds
+        raw: acc and gyro are raw SH3001 values, else body frame g and degree/s
+        return: list of Attitude
+        """
+        result = []
+        last = None
+        for timestamp, acc, gyro in samples:
+            if raw:
+                acc, gyro = sensor2body(acc, gyro)
+            if last is None:
+                self.reset(acc)
+                self.timestamp = timestamp
+                result.append(self.attitude())
+            else:
+                result.append(self.update(acc, gyro, timestamp - last, timestamp))
+            last = timestamp
+        return result
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Continuous parametric gait generator
+
+Unlike Walk and Trot, which precompute one whole cycle for a few fixed
+directions, GaitGenerator yields leg coords one frame at a time from
+continuous commands that can be changed between frames:
+
+    velocity:    forward speed of the body, mm/s, negative for backward
+    turn_rate:   yaw rate, degree/s, positive turns left
+    step_height: foot lift, mm
+    cadence:     gait cycles per second
+
+Every leg follows the same foot trajectory shifted by its phase offset: a
+cosine swing forward with a sine lift, then a linear stance back on the
+ground. The stride of each side comes from a differential drive model, so
+turning is continuous instead of the LEFT/STRAIGHT/RIGHT step scales.
+
+The phase keeps running across command and gait changes, strides and lift
+follow new commands over about BLEND_FRAMES frames and a gait change
+crossfades the foot positions, so feet never jump. splice_cycle does the
+same for precomputed cycles like Walk.get_coords().
+"""
+
+import threading
+from collections import deque
+from math import cos, sin, pi, radians
+
+BLEND_FRAMES = 6
+
+
+def splice_cycle(current, index, cycle, blend_frames=BLEND_FRAMES):
+    """
+    Switch from a running periodic cycle to another one at the matching
+    phase, instead of restarting the new cycle from its first frame.
+
+    current: frames of the running cycle, leg coords or servo angles
+    index: index in current of the next frame that would be played
+    cycle: frames of the cycle to switch to
+    blend_frames: number of frames crossfaded from current to cycle
+    return: (transition, next_index), the blended frames to play first,
+            then continue with cycle[next_index]
+    """
+    start = int(round(index / len(current) * len(cycle))) % len(cycle)
+    count = min(blend_frames, len(cycle))
+    transition = []
+    for k in range(count):
+        w = (k + 1) / (count + 1)
+        transition.append(_mix(current[(index + k) % len(current)],
+                               cycle[(start + k) % len(cycle)], w))
+    return transition, (start + count) % len(cycle)
+
+
+def _mix(a, b, w):
+    if isinstance(a, (list, tuple)):
+        return [_mix(x, y, w) for x, y in zip(a, b)]
+    return a + (b - a) * w
+
+
+class GaitGenerator():
+
+    WALK = 'walk'
+    TROT = 'trot'
+
+    # leg order: left front, right front, left hind, right hind
+    # walk: legs raised one by one in order 1, 4, 2, 3, like Walk
+    # trot: diagonal pairs [1, 4], [2, 3], like Trot
+    GAITS = {
+        WALK: {
+            'phases': [0, 0.5, 0.25, 0.75],
+            'swing': 1 / 8,
+            'centers': [-25, -25, 5, 5],
+        },
+        TROT: {
+            'phases': [0, 0.5, 0.5, 0],
+            'swing': 0.5,
+            'centers': [-22, -22, -12, -12],
+        },
+    }
+    LEFT_LEGS = [0, 2]
+
+    Z_ORIGIN = 80
+    MAX_STEP_WIDTH = 100    # mm, stride limit of a single leg
+    HALF_TRACK = 49         # mm, half of the body width
+    FRAME_RATE = 30         # frames per second
+
+    def __init__(self, gait=WALK, velocity=0, turn_rate=0, step_height=20, cadence=0.6,
+                 frame_rate=FRAME_RATE):
+        """
+            GaitGenerator init
+            gait: WALK or TROT
+            velocity, turn_rate, step_height, cadence: see set_command
+            frame_rate: frames per second the frames are consumed at
+        """
+        if gait not in self.GAITS:
+            raise ValueError("gait must be 'walk' or 'trot'")
+        self.gait = gait
+        self.frame_rate = frame_rate
+        self.phase = 0.0
+        self.velocity = 0.0
+        self.turn_rate = 0.0
+        self.step_height = 0.0
+        self.cadence = 0.0
+        self.set_command(velocity, turn_rate, step_height, cadence)
+
+        # strides and lift actually used, they follow the commands smoothly
+        self.current_strides = self.strides()
+        self.current_step_height = self.target_step_height()
+        # gait being faded out and the remaining fade frames
+        self.previous_gait = None
+        self.gait_blend = 0
+
+    def set_command(self, velocity=None, turn_rate=None, step_height=None, cadence=None):
+        """
+        Update the commands, takes effect from the next frame, None keeps the current value
+        """
+        if velocity is not None:
+            self.velocity = float(velocity)
+        if turn_rate is not None:
+            self.turn_rate = float(turn_rate)
+        if step_height is not None:
+            self.step_height = max(0.0, float(step_height))
+        if cadence is not None:
+            self.cadence = max(0.0, float(cadence))
+
+    def set_gait(self, gait):
+        """
+        Switch between WALK and TROT, the foot positions are crossfaded over
+        BLEND_FRAMES frames at the current phase
+        """
+        if gait not in self.GAITS:
+            raise ValueError("gait must be 'walk' or 'trot'")
+        if gait != self.gait:
+            self.previous_gait = self.gait
+            self.gait = gait
+            self.gait_blend = BLEND_FRAMES
+
+    def target_step_height(self):
+        # keep the feet on the ground when standing still
+        return self.step_height if any(self.strides()) else 0.0
+
+    def strides(self):
+        """
+        Stride length of every leg for the current commands, mm per cycle
+        """
+        if self.cadence == 0:
+            return [0.0] * 4
+        turn = radians(self.turn_rate) * self.HALF_TRACK
+        left = (self.velocity - turn) / self.cadence
+        right = (self.velocity + turn) / self.cadence
+        scale = max(abs(left), abs(right)) / self.MAX_STEP_WIDTH
+        if scale > 1:
+            left /= scale
+            right /= scale
+        return [left if i in self.LEFT_LEGS else right for i in range(4)]
+
+    def foot(self, leg, phase, stride, step_height, gait=None):
+        """
+        [y, z] of a leg at a phase of the cycle
+        """
+        gait = self.GAITS[gait or self.gait]
+        center = gait['centers'][leg]
+        swing = gait['swing']
+        p = (phase + gait['phases'][leg]) % 1.0
+        if p < swing:
+            s = p / swing
+            y = center + stride / 2 * cos(pi * s)
+            z = self.Z_ORIGIN - step_height * sin(pi * s)
+        else:
+            s = (p - swing) / (1 - swing)
+            y = center - stride / 2 + stride * s
+            z = self.Z_ORIGIN
+        return [y, z]
+
+    def next_frame(self):
+        """
+        Advance one frame with the current commands
+
+        :return: leg coords, [[y, z]] * 4
+        :rtype: list
+        """
+        # first order follow of the commands, reaches ~90% in BLEND_FRAMES
+        k = 2 / (BLEND_FRAMES + 1)
+        strides = self.strides()
+        self.current_strides = [s + (t - s) * k for s, t in zip(self.current_strides, strides)]
+        self.current_step_height += (self.target_step_height() - self.current_step_height) * k
+
+        coords = [self.foot(i, self.phase, self.current_strides[i], self.current_step_height)
+                  for i in range(4)]
+        if self.gait_blend > 0:
+            w = 1 - self.gait_blend / (BLEND_FRAMES + 1)
+            previous = [self.foot(i, self.phase, self.current_strides[i], self.current_step_height,
+                                  self.previous_gait) for i in range(4)]
+            coords = _mix(previous, coords, w)
+            self.gait_blend -= 1
+        self.phase = (self.phase + self.cadence / self.frame_rate) % 1.0
+        return coords
+
+    def frames(self):
+        """
+        Generator of leg coords, one frame per iteration, never ends
+        """
+        while True:
+            yield self.next_frame()
+
+
+class GaitRunner():
+    """
+    Stream the frames of a GaitGenerator to the legs of a Pidog in a thread,
+    keeping at most BUFFER_FRAMES frames queued so new commands apply quickly
+    """
+
+    BUFFER_FRAMES = 2
+    SPEED = 98
+    WAIT_TIMEOUT = 0.1  # s, how often stop is checked while the buffer is full
+
+    def __init__(self, dog, generator=None):
+        self.dog = dog
+        self.generator = generator if generator is not None else GaitGenerator()
+        self.thread = None
+        self.running = False
+
+    def set_command(self, **kwargs):
+        self.generator.set_command(**kwargs)
+
+    def _run(self):
+        frames = self.generator.frames()
+        handles = deque()   # handles of the queued frames, oldest first
+        while self.running:
+            while handles and handles[0].done():
+                handles.popleft()
+            if len(handles) >= self.BUFFER_FRAMES:
+                # block until the oldest frame is written
+                handles[0].wait(self.WAIT_TIMEOUT)
+                continue
+            angles = self.dog.legs_angle_calculation(next(frames))
+            handles.append(self.dog.legs_move([angles], immediately=False, speed=self.SPEED))
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(name='gait_thread', target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+GPIO edge events
+
+The IMU thread waits for the SH3001 interrupt line instead of sleeping:
+
+    EdgeEvent: an edge flag set by fire() and waited for with wait(). It has
+               no hardware, tests and simulations call fire() themselves
+               (or pass an EdgeEvent to Pidog(imu_interrupt=...)).
+    PinEdge:   an EdgeEvent fired by the edges of a robot_hat Pin, from the
+               GPIO callback thread.
+"""
+
+import threading
+from time import monotonic
+from robot_hat import Pin
+
+
+class EdgeEvent():
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.timestamp = None   # monotonic time of the last edge
+        self.count = 0          # edges since created
+
+    def fire(self):
+        self.timestamp = monotonic()
+        self.count += 1
+        self.event.set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for an edge since the previous wait
+
+        :return: True on an edge, False on timeout
+        """
+        fired = self.event.wait(timeout)
+        self.event.clear()
+        return fired
+
+    def close(self):
+        # wake up a waiting thread
+        self.event.set()
+
+
+class PinEdge(EdgeEvent):
+
+    BOUNCETIME = 1  # ms, shorter than the sample period
+
+    def __init__(self, pin, trigger=Pin.IRQ_RISING, pull=Pin.PULL_NONE, bouncetime=BOUNCETIME):
+        """
+            PinEdge init
+            pin: robot_hat pin name, e.g. 'D4'
+            trigger: Pin.IRQ_RISING, IRQ_FALLING or IRQ_RISING_FALLING
+            pull: Pin.PULL_NONE, PULL_UP or PULL_DOWN
+            bouncetime: ms
+        """
+        super().__init__()
+        self.pin = Pin(pin, mode=Pin.IN)
+        self.pin.irq(lambda *args: self.fire(), trigger, bouncetime=bouncetime, pull=pull)
+
+    def close(self):
+        super().close()
+        self.pin.close()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Precomputed leg IK lookup table
+
+Both legs share the same link lengths, so the (y, z) -> (alpha, beta) mapping
+of Pidog.coord2polar is tabulated once on a dense grid and then solved with
+bilinear interpolation, no trigonometric calls per leg per tick.
+
+Error bound: with the default 0.5 mm grid the interpolated angles are within
+MAX_ERROR (0.05 degree) of the exact solution for every point whose distance u
+from the shoulder satisfies
+
+    |FOOT - LEG| + EDGE_MARGIN <= u <= FOOT + LEG - EDGE_MARGIN
+
+Near full extension/folding the acos terms are not smooth enough to
+interpolate, so points outside that band (and outside the grid) are solved
+exactly instead. The bound therefore holds everywhere.
+"""
+
+import os
+import numpy as np
+from . import kinematics
+
+
+class IKTable():
+
+    GRID_STEP = 0.5         # mm
+    Y_RANGE = (-120, 120)   # mm
+    Z_RANGE = (0, 120)      # mm
+    EDGE_MARGIN = 2.5       # mm
+    MAX_ERROR = 0.05        # degree, for the default GRID_STEP
+
+    def __init__(self, leg=kinematics.LEG, foot=kinematics.FOOT, step=GRID_STEP, cache_dir=None):
+        """
+            IKTable init
+            leg, foot: link lengths in mm
+            step: grid step in mm
+            cache_dir: directory for the cached table, generate in memory only if None
+        """
+        self.leg = leg
+        self.foot = foot
+        self.step = step
+        self.y0 = self.Y_RANGE[0]
+        self.z0 = self.Z_RANGE[0]
+        self.ny = int(round((self.Y_RANGE[1] - self.Y_RANGE[0]) / step)) + 1
+        self.nz = int(round((self.Z_RANGE[1] - self.Z_RANGE[0]) / step)) + 1
+        self.u2_min = (abs(foot - leg) + self.EDGE_MARGIN)**2
+        self.u2_max = (foot + leg - self.EDGE_MARGIN)**2
+
+        self.path = None
+        if cache_dir is not None:
+            self.path = os.path.join(cache_dir, self.file_name())
+        self.table = self.load()
+
+    def file_name(self):
+        return 'ik_table_%s_%s_%s.npy' % (self.leg, self.foot, self.step)
+
+    def generate(self):
+        """
+        Solve every grid point exactly
+
+        return: (2, ny, nz) float32 array of alpha and beta in degrees
+        """
+        ys = self.y0 + np.arange(self.ny) * self.step
+        zs = self.z0 + np.arange(self.nz) * self.step
+        grid = np.stack(np.meshgrid(ys, zs, indexing='ij'), axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            alpha, beta = kinematics.coords2polar(grid, self.leg, self.foot)
+        return np.stack([alpha, beta]).astype(np.float32)
+
+    def load(self):
+        """
+        Load the cached table, generate and save it if missing or mismatched
+        """
+        shape = (2, self.ny, self.nz)
+        if self.path is not None and os.path.isfile(self.path):
+            try:
+                table = np.load(self.path, mmap_mode='r')
+                if table.shape == shape:
+                    return table
+            except (OSError, ValueError):
+                pass
+        table = self.generate()
+        if self.path is not None:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = self.path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    np.save(f, table)
+                os.replace(tmp, self.path)
+            except OSError:
+                pass
+        return table
+
+    def coords2polar(self, coords, alpha_offset=0):
+        """
+        Same interface as kinematics.coords2polar
+
+        coords: (..., 2) array of [y, z]
+        alpha_offset: radians added to alpha
+        return: (alpha, beta) arrays in degrees, shape (...)
+        """
+        coords = np.asarray(coords, dtype=float)
+        y = coords[..., 0]
+        z = coords[..., 1]
+
+        fy = (y - self.y0) / self.step
+        fz = (z - self.z0) / self.step
+        i = np.floor(fy).astype(int)
+        j = np.floor(fz).astype(int)
+        u2 = y**2 + z**2
+        exact = (u2 < self.u2_min) | (u2 > self.u2_max) \
+            | (i < 0) | (i >= self.ny - 1) | (j < 0) | (j >= self.nz - 1)
+        i = np.clip(i, 0, self.ny - 2)
+        j = np.clip(j, 0, self.nz - 2)
+        ty = fy - i
+        tz = fz - j
+
+        t = self.table
+        w00 = (1 - ty) * (1 - tz)
+        w10 = ty * (1 - tz)
+        w01 = (1 - ty) * tz
+        w11 = ty * tz
+        alpha = t[0, i, j] * w00 + t[0, i+1, j] * w10 + t[0, i, j+1] * w01 + t[0, i+1, j+1] * w11
+        beta = t[1, i, j] * w00 + t[1, i+1, j] * w10 + t[1, i, j+1] * w01 + t[1, i+1, j+1] * w11
+
+        if np.any(exact):
+            e_alpha, e_beta = kinematics.coords2polar(coords[exact], self.leg, self.foot)
+            alpha = np.array(alpha, dtype=float)
+            beta = np.array(beta, dtype=float)
+            alpha[exact] = e_alpha
+            beta[exact] = e_beta
+
+        alpha = alpha + np.asarray(alpha_offset) * (180 / np.pi)
+        return alpha, beta
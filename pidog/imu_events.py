@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Motion events from the SH3001 detectors
+
+The SH3001 detects tap, double tap, free fall, high g, low g, activity,
+inactivity, flat and orientation changes on chip. ImuEvents configures the
+detectors, maps them to the INT pin with latched status and turns the
+status bits into timestamped ImuEvent callbacks:
+
+    my_dog.imu_events.enable('free_fall', lambda event: print(event))
+    my_dog.imu_events.enable('tap', on_tap, threshold=0x30)
+
+The IMU thread calls poll() on every wake up: within one interrupt when
+Pidog(imu_interrupt=...) is used (the detectors share the INT pin with the
+data ready interrupt), else every IMU_PERIOD. The status read clears the
+latched interrupts. Callbacks run in a dispatcher thread, so they may block
+(e.g. body_stop) without delaying the IMU.
+"""
+
+import queue
+import threading
+from collections import namedtuple
+from time import monotonic
+from .sh3001 import Sh3001
+
+ImuEvent = namedtuple('ImuEvent', ['timestamp', 'name', 'status'])
+
+
+class ImuEvents():
+
+    # name: (status flag, detector config method of Sh3001)
+    DETECTORS = {
+        'tap': (Sh3001.SH3001_INT_TAP, 'tap_config'),
+        'double_tap': (Sh3001.SH3001_INT_DOUBLE_TAP, 'tap_config'),
+        'free_fall': (Sh3001.SH3001_INT_FREE_FALL, 'freefall_config'),
+        'high_g': (Sh3001.SH3001_INT_HIGHG, 'highg_config'),
+        'low_g': (Sh3001.SH3001_INT_LOWG, 'lowg_config'),
+        'activity': (Sh3001.SH3001_INT_ACT, 'act_config'),
+        'inactivity': (Sh3001.SH3001_INT_INACT, 'inact_config'),
+        'flat': (Sh3001.SH3001_INT_FLAT, 'flat_config'),
+        'orientation': (Sh3001.SH3001_INT_ORIENTATION, 'orient_config'),
+    }
+
+    def __init__(self, imu, pin=Sh3001.SH3001_INT_MAP_INT):
+        """
+            ImuEvents init
+            imu: Sh3001
+            pin: Sh3001.SH3001_INT_MAP_INT or SH3001_INT_MAP_INT1, pin the detectors drive
+        """
+        self.imu = imu
+        self.pin = pin
+        self.enabled = 0        # status flags of the enabled detectors
+        self.callbacks = {}     # name -> [fn]
+        self.lock = threading.Lock()
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+
+    def enable(self, name, callback=None, **config):
+        '''
+        Configure and enable a detector
+
+        :param name: a key of DETECTORS
+        :type name: str
+        :param callback: fn(ImuEvent) called on each event, None for none
+        :param config: arguments of the Sh3001 config method, e.g. threshold
+        '''
+        flag, method = self.DETECTORS[name]
+        getattr(self.imu, method)(**config)
+        if not self.enabled:
+            # latched, until poll reads the status
+            self.imu.int_config(latch=Sh3001.SH3001_INT_LATCH)
+        self.imu.int_enable(flag, pin=self.pin)
+        with self.lock:
+            self.enabled |= flag
+        if callback is not None:
+            self.add_callback(name, callback)
+
+    def disable(self, name):
+        flag = self.DETECTORS[name][0]
+        self.imu.int_enable(flag, Sh3001.SH3001_INT_DISABLE)
+        with self.lock:
+            self.enabled &= ~flag
+            self.callbacks.pop(name, None)
+
+    def add_callback(self, name, fn):
+        with self.lock:
+            self.callbacks.setdefault(name, []).append(fn)
+            if self.thread is None:
+                self.thread = threading.Thread(name='imu_events_thread', target=self._dispatch)
+                self.thread.daemon = True
+                self.thread.start()
+
+    def remove_callback(self, name, fn):
+        with self.lock:
+            if fn in self.callbacks.get(name, []):
+                self.callbacks[name].remove(fn)
+
+    def poll(self, timestamp=None):
+        '''
+        Read the interrupt status and queue the events of the enabled detectors
+
+        :param timestamp: monotonic time of the interrupt, now if None
+        :return: list of ImuEvent
+        '''
+        if not self.enabled:
+            return []
+        status = self.imu.int_status()
+        fired = status & self.enabled
+        if not fired:
+            return []
+        if timestamp is None:
+            timestamp = monotonic()
+        events = [ImuEvent(timestamp, name, status) for name, (flag, _) in self.DETECTORS.items()
+                  if fired & flag]
+        if self.thread is not None:
+            for event in events:
+                self.queue.put(event)
+        return events
+
+    def _dispatch(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                break
+            with self.lock:
+                callbacks = list(self.callbacks.get(event.name, []))
+            for fn in callbacks:
+                try:
+                    fn(event)
+                except Exception as e:
+                    print(f'\r_imu_events_thread Exception:{e}')
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Timestamped IMU samples in shared memory
+
+The IMU thread appends every sample (monotonic timestamp, offset corrected
+raw accelerometer and gyro, attitude) to an ImuRing. Readers in any thread,
+or in another process attached by name, get NumPy views of the history
+without copying:
+
+    ring = ImuRing.attach(my_dog.imu_ring.name)   # unrelated process, a
+                                                  # forked one uses my_dog.imu_ring
+    ring.latest()               # (FIELDS,) newest sample
+    ring.since(t)               # (n, FIELDS) samples newer than t
+    ring.window(50)             # (50, FIELDS) newest 50 samples
+    ring.window(50)[:, ImuRing.PITCH]
+
+Each sample is written twice, at i and i + capacity of a 2 x capacity array,
+so the newest capacity samples are always one contiguous slice. The sample
+count is published after the rows are written, a reader never sees a
+partial sample. Reads stop one sample short of capacity, the slot being
+written next. A view stays valid until capacity - 1 more samples are
+written, check it with valid(count) when that matters.
+
+The timestamps never decrease, since() relies on it. Samples read in
+batches (the SH3001 FIFO) get their timestamps from batch_timestamps, which
+keeps a batch after the previous one.
+"""
+
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+
+def batch_timestamps(count, end, previous, period):
+    """
+    Timestamps of count samples period apart, the newest read at end. When the
+    batch would start before the previous sample, the samples are spread
+    evenly between previous and end instead.
+
+    count: samples in the batch
+    end: monotonic time of the newest sample, s
+    previous: timestamp of the last sample written, None if none
+    period: sample period, s
+    return: list of timestamps, oldest first
+    """
+    if previous is not None and count > 0:
+        period = min(period, max(0.0, end - previous) / count)
+    return [end - (count - 1 - i) * period for i in range(count)]
+
+
+class ImuRing():
+
+    FIELDS = ['timestamp', 'ax', 'ay', 'az', 'gx', 'gy', 'gz', 'pitch', 'roll', 'yaw']
+    TIMESTAMP, AX, AY, AZ, GX, GY, GZ, PITCH, ROLL, YAW = range(10)
+    CAPACITY = 4096     # samples, about 8 s at 500 Hz
+
+    def __init__(self, capacity=CAPACITY, name=None):
+        """
+            ImuRing init
+            capacity: samples kept
+            name: name of an existing ring to attach to, a new ring is created if None
+        """
+        width = len(self.FIELDS)
+        if name is None:
+            size = 16 + 2 * capacity * width * 8
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, track=False)   # Python 3.13+
+            except TypeError:
+                self.shm = shared_memory.SharedMemory(name=name)
+                # the ring belongs to the writer, the tracker of this process must not unlink it
+                resource_tracker.unregister(self.shm._name, 'shared_memory')
+            self.owner = False
+        self.header = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.header[:] = [0, capacity]
+        self.capacity = int(self.header[1])
+        self.data = np.ndarray((2 * self.capacity, width), dtype=np.float64,
+                               buffer=self.shm.buf, offset=16)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name=name)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def count(self):
+        # samples written since created
+        return int(self.header[0])
+
+    def append(self, timestamp, acc, gyro, pitch, roll, yaw):
+        """
+        Add a sample, single writer only
+        """
+        count = self.count
+        i = count % self.capacity
+        row = (timestamp, *acc, *gyro, pitch, roll, yaw)
+        self.data[i] = row
+        self.data[i + self.capacity] = row
+        self.header[0] = count + 1
+
+    def valid(self, count):
+        """
+        Whether views taken when count was count are not overwritten yet
+        """
+        return self.count - count < self.capacity - 1
+
+    def window(self, n):
+        """
+        The newest n samples, oldest first
+
+        :param n: samples, at most capacity - 1
+        :return: (m, FIELDS) view, m = min(n, samples written)
+        """
+        count = self.count
+        n = min(n, count, self.capacity - 1)
+        end = (count - 1) % self.capacity + self.capacity + 1 if count else 0
+        return self.data[end - n:end]
+
+    def latest(self):
+        """
+        :return: (FIELDS,) view of the newest sample, None if empty
+        """
+        window = self.window(1)
+        return window[0] if len(window) else None
+
+    def since(self, timestamp):
+        """
+        Samples newer than timestamp, at most capacity - 1, a binary search
+        over the timestamps, which never decrease
+
+        :param timestamp: monotonic time, s
+        :return: (m, FIELDS) view, oldest first
+        """
+        window = self.window(self.capacity)
+        start = np.searchsorted(window[:, self.TIMESTAMP], timestamp, side='right')
+        return window[start:]
+
+    def close(self):
+        # views must not be used after close
+        self.header = None
+        self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # a reader still holds a view, the mapping goes with the process
+            pass
+
+    def release(self):
+        """
+        Close and, in the creating process, free the shared memory
+        """
+        self.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
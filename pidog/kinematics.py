@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Vectorized leg kinematics for Pidog
+
+Every function works on whole arrays of frames at once, so a gait of N frames
+is solved with a handful of numpy calls instead of N*4 calls of
+Pidog.coord2polar.
+
+    coords: (..., 4, 2) array of [y, z] per leg, in mm
+    angles: (..., 8) array of servo angles, in degrees, same order as
+            Pidog.legs_angle_calculation
+"""
+
+import numpy as np
+from math import pi
+
+LEG = 42
+FOOT = 76
+BODY_LENGTH = 117
+BODY_WIDTH = 98
+# shoulder positions of the 4 legs in body frame, one row per leg
+BODY_STRUCT = np.array([
+    [-BODY_WIDTH / 2, -BODY_LENGTH / 2, 0],
+    [BODY_WIDTH / 2, -BODY_LENGTH / 2, 0],
+    [-BODY_WIDTH / 2, BODY_LENGTH / 2, 0],
+    [BODY_WIDTH / 2, BODY_LENGTH / 2, 0]])
+
+
+def coords2polar(coords, leg=LEG, foot=FOOT, alpha_offset=0):
+    """
+    Batch version of Pidog.coord2polar
+
+    coords: (..., 2) array of [y, z]
+    alpha_offset: radians added to alpha, the body pitch for field coords
+                  (see Pidog.fieldcoord2polar)
+    return: (alpha, beta) arrays in degrees, shape (...)
+    """
+    coords = np.asarray(coords, dtype=float)
+    y = coords[..., 0]
+    z = coords[..., 1]
+    u = np.sqrt(y**2 + z**2)
+    cos_angle1 = (foot**2 + leg**2 - u**2) / (2 * foot * leg)
+    cos_angle1 = np.clip(cos_angle1, -1, 1)
+    beta = np.arccos(cos_angle1)
+
+    angle1 = np.arctan2(y, z)
+    cos_angle2 = (leg**2 + u**2 - foot**2) / (2 * leg * u)
+    cos_angle2 = np.clip(cos_angle2, -1, 1)
+    angle2 = np.arccos(cos_angle2)
+    alpha = angle2 + angle1 + alpha_offset
+
+    alpha = alpha / pi * 180
+    beta = beta / pi * 180
+
+    return alpha, beta
+
+
+def polar2angles(alpha, beta):
+    """
+    Convert (alpha, beta) of shape (..., 4) to servo angles of shape (..., 8),
+    the right side legs are mirrored.
+    """
+    leg_angle = np.array(alpha, dtype=float)
+    foot_angle = np.array(beta, dtype=float) - 90
+    leg_angle[..., 1::2] *= -1
+    foot_angle[..., 1::2] *= -1
+    angles = np.empty(leg_angle.shape[:-1] + (8,))
+    angles[..., 0::2] = leg_angle
+    angles[..., 1::2] = foot_angle
+    return angles
+
+
+def angles2polar(angles, offsets=None):
+    """
+    Inverse of polar2angles
+
+    angles: (..., 8) array of servo angles
+    offsets: (8,) calibration correction in degrees added to the angles, None for none
+    return: (alpha, beta) arrays in degrees, shape (..., 4)
+    """
+    angles = np.array(angles, dtype=float)
+    if offsets is not None:
+        angles += np.asarray(offsets, dtype=float)
+    angles[..., 2::4] *= -1
+    angles[..., 3::4] *= -1
+    return angles[..., 0::2], angles[..., 1::2] + 90
+
+
+def polar2coords(alpha, beta, leg=LEG, foot=FOOT):
+    """
+    Forward kinematics of the 2-link leg, inverse of coords2polar
+
+    The knee is at leg * [sin(alpha), cos(alpha)] from the shoulder and the
+    foot link turns back by the knee angle beta, so its direction is
+    alpha + beta + 180 degrees.
+
+    alpha, beta: arrays in degrees
+    return: (..., 2) array of [y, z]
+    """
+    alpha = np.radians(alpha)
+    foot_dir = alpha + np.radians(beta)
+    coords = np.empty(np.shape(alpha) + (2,))
+    coords[..., 0] = leg * np.sin(alpha) - foot * np.sin(foot_dir)
+    coords[..., 1] = leg * np.cos(alpha) - foot * np.cos(foot_dir)
+    return coords
+
+
+def legs_coords_calculation(angles, leg=LEG, foot=FOOT, offsets=None):
+    """
+    Foot positions from servo angles, inverse of legs_angle_calculation
+
+    angles: (N, 8) array of servo angles, or (8,) for a single frame
+    offsets: (8,) calibration correction in degrees added to the angles, None for none
+    return: (N, 4, 2) array of leg coords, or (4, 2) for a single frame
+    """
+    alpha, beta = angles2polar(angles, offsets)
+    return polar2coords(alpha, beta, leg, foot)
+
+
+# velocity control
+SINGULAR_SIN = 0.15    # |sin(beta)| below which the Jacobian is damped
+MAX_DAMPING = 8.0      # mm, damping at full extension/folding
+
+
+def jacobian(alpha, beta, leg=LEG, foot=FOOT):
+    """
+    Jacobian of polar2coords, d[y, z] / d[alpha, beta] in mm per radian
+
+    alpha, beta: arrays in degrees
+    return: (..., 2, 2) array, its determinant is leg * foot * sin(beta),
+            singular at full extension (beta = 180) or folding (beta = 0)
+    """
+    alpha = np.radians(alpha)
+    foot_dir = alpha + np.radians(beta)
+    j = np.empty(np.shape(alpha) + (2, 2))
+    j[..., 0, 0] = leg * np.cos(alpha) - foot * np.cos(foot_dir)
+    j[..., 0, 1] = -foot * np.cos(foot_dir)
+    j[..., 1, 0] = -leg * np.sin(alpha) + foot * np.sin(foot_dir)
+    j[..., 1, 1] = foot * np.sin(foot_dir)
+    return j
+
+
+def foot_velocity2polar_rate(alpha, beta, velocities, leg=LEG, foot=FOOT):
+    """
+    Joint rates for foot velocities, damped least squares
+
+        rate = J^T (J J^T + damping^2 I)^-1 v
+
+    The damping is 0 away from the singularities, so the solution is exact
+    there, and grows to MAX_DAMPING as |sin(beta)| goes from SINGULAR_SIN to 0,
+    which keeps the rates bounded near full extension.
+
+    alpha, beta: arrays in degrees, shape (...)
+    velocities: (..., 2) array of [vy, vz] in mm/s
+    return: (alpha rate, beta rate) arrays in degree/s, shape (...)
+    """
+    j = jacobian(alpha, beta, leg, foot)
+    v = np.asarray(velocities, dtype=float)
+    s = np.abs(np.sin(np.radians(beta)))
+    damping = MAX_DAMPING * np.clip(1 - s / SINGULAR_SIN, 0, None)
+
+    # a = J J^T + damping^2 I, symmetric 2x2
+    a00 = j[..., 0, 0]**2 + j[..., 0, 1]**2 + damping**2
+    a11 = j[..., 1, 0]**2 + j[..., 1, 1]**2 + damping**2
+    a01 = j[..., 0, 0] * j[..., 1, 0] + j[..., 0, 1] * j[..., 1, 1]
+    det = a00 * a11 - a01**2
+    w0 = (a11 * v[..., 0] - a01 * v[..., 1]) / det
+    w1 = (a00 * v[..., 1] - a01 * v[..., 0]) / det
+    alpha_rate = j[..., 0, 0] * w0 + j[..., 1, 0] * w1
+    beta_rate = j[..., 0, 1] * w0 + j[..., 1, 1] * w1
+    return np.degrees(alpha_rate), np.degrees(beta_rate)
+
+
+def legs_angle_calculation(coords, leg=LEG, foot=FOOT, table=None):
+    """
+    Batch version of Pidog.legs_angle_calculation
+
+    coords: (N, 4, 2) array of leg coords, or (4, 2) for a single frame
+    table: IKTable to interpolate from, solve exactly if None
+    return: (N, 8) array of servo angles, or (8,) for a single frame
+    """
+    if table is None:
+        alpha, beta = coords2polar(coords, leg, foot)
+    else:
+        alpha, beta = table.coords2polar(coords)
+    return polar2angles(alpha, beta)
+
+
+# body pose
+def rpy2rotation(rpy):
+    """
+    Body rotation matrix, roll about the y axis, then -pitch about the x axis,
+    then yaw about the z axis. The products are expanded so no intermediate
+    matrices are built.
+
+    rpy: (..., 3) array of [roll, pitch, yaw] in radians
+    return: (..., 3, 3) rotation matrices
+    """
+    rpy = np.asarray(rpy, dtype=float)
+    cr, sr = np.cos(rpy[..., 0]), np.sin(rpy[..., 0])
+    cp, sp = np.cos(rpy[..., 1]), np.sin(rpy[..., 1])
+    cy, sy = np.cos(rpy[..., 2]), np.sin(rpy[..., 2])
+    # rotx * roty
+    m = np.empty(rpy.shape[:-1] + (3, 3))
+    m[..., 0, 0] = cr
+    m[..., 0, 1] = sr * sp
+    m[..., 0, 2] = -sr * cp
+    m[..., 1, 0] = 0
+    m[..., 1, 1] = cp
+    m[..., 1, 2] = sp
+    m[..., 2, 0] = sr
+    m[..., 2, 1] = -cr * sp
+    m[..., 2, 2] = cr * cp
+    # (rotx * roty) * rotz
+    cy = cy[..., None]
+    sy = sy[..., None]
+    rot = np.empty_like(m)
+    rot[..., :, 0] = m[..., :, 0] * cy + m[..., :, 1] * sy
+    rot[..., :, 1] = m[..., :, 1] * cy - m[..., :, 0] * sy
+    rot[..., :, 2] = m[..., :, 2]
+    return rot
+
+
+def legs2points(legs, body_height):
+    """
+    Foot points in field frame from leg coords, see Pidog.set_legs
+
+    legs: (..., 4, 2) array of [y, z] per leg
+    return: (..., 4, 3) array of [x, y, z] per leg
+    """
+    legs = np.asarray(legs, dtype=float)
+    points = np.empty(legs.shape[:-1] + (3,))
+    points[..., 0] = BODY_STRUCT[:, 0]
+    points[..., 1] = BODY_STRUCT[:, 1] + legs[..., 0]
+    points[..., 2] = body_height - legs[..., 1]
+    return points
+
+
+def pose2body_points(poses, rpys):
+    """
+    Shoulder points in field frame for body poses
+
+    poses: (..., 3) array of body position [x, y, z]
+    rpys: (..., 3) array of [roll, pitch, yaw] in radians
+    return: (..., 4, 3) array of [x, y, z] per leg
+    """
+    rot = rpy2rotation(rpys)
+    poses = np.asarray(poses, dtype=float)
+    return poses[..., None, :] + np.einsum('...ij,lj->...li', rot, BODY_STRUCT)
+
+
+def points2legs_angle(poses, rpys, points, leg=LEG, foot=FOOT, table=None):
+    """
+    Batch version of Pidog.pose2legs_angle
+
+    poses: (..., 3) array of body position [x, y, z]
+    rpys: (..., 3) array of [roll, pitch, yaw] in radians
+    points: (..., 4, 3) foot points in field frame
+    table: IKTable to interpolate from, solve exactly if None
+    return: (..., 8) array of servo angles
+    """
+    body = pose2body_points(poses, rpys)
+    points = np.asarray(points, dtype=float)
+    coords = np.empty(body.shape[:-1] + (2,))
+    coords[..., 0] = points[..., 1] - body[..., 1]
+    coords[..., 1] = body[..., 2] - points[..., 2]
+    pitch = np.asarray(rpys, dtype=float)[..., 1, None]
+    if table is None:
+        alpha, beta = coords2polar(coords, leg, foot, pitch)
+    else:
+        alpha, beta = table.coords2polar(coords, pitch)
+    return polar2angles(alpha, beta)
+
+
+def pose2legs_angle(poses, rpys, legs, body_height, leg=LEG, foot=FOOT, table=None):
+    """
+    Servo angles for a batch of body poses and leg targets
+
+    poses: (N, 3) body positions [x, y, z]
+    rpys: (N, 3) body [roll, pitch, yaw] in radians
+    legs: (N, 4, 2) leg coords [y, z], as passed to Pidog.set_legs
+    table: IKTable to interpolate from, solve exactly if None
+    return: (N, 8) array of servo angles
+    """
+    points = legs2points(legs, body_height)
+    return points2legs_angle(poses, rpys, points, leg, foot, table)
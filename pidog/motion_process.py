@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Motion engine in a separate process
+
+In this mode the MotionScheduler runs in a child process, so servo timing
+no longer shares the GIL with the application (web server, speech, curses
+...). The parent and the child exchange everything through shared memory:
+
+    SharedActionQueue: the ActionQueue ring, frame sequence numbers and
+                       state live in a multiprocessing.shared_memory block,
+                       guarded by process-shared lock and conditions, so
+                       Pidog uses it exactly like the in-process queue.
+                       The child publishes the frame being played
+                       (current) and the interpolated servo positions.
+    stats:             the TickStats of the child scheduler and the write
+                       counters of the child ServoOutput robots
+    offsets:           the servo offsets of every robot, set_offset forwards
+                       the calibration of the parent to the child
+
+In real-time mode the child locks its own memory (memory locks are not
+inherited through fork) and its scheduler thread runs under SCHED_FIFO.
+
+The child is forked, it inherits the Robot objects of the parent and must
+be started before any other thread. After the fork the two copies are
+independent: any Robot state changed in the parent, other than the offsets
+forwarded through set_offset, is not seen by the child. Servos written
+directly from the parent (Robot.servo_write_all, Pidog.legs_simple_move)
+bypass the child, which keeps playing its queues from its own positions.
+"""
+
+import signal
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from .action_queue import ActionQueue
+from .motion_scheduler import MotionScheduler, MotionChannel
+from .trajectory import TimedFrame
+from .realtime import lock_memory
+
+# header fields of a SharedActionQueue
+HEAD, COUNT, NEXT_SEQ, INFLIGHT, PREEMPTED, CLOSED, SPEED, HAS_CURRENT = range(8)
+HEADER_SIZE = 8
+STATS_KEYS = ['ticks', 'overruns', 'period', 'last_period', 'mean_period', 'max_period',
+              'last_work', 'mean_work', 'max_work', 'jitter_p50', 'jitter_p99', 'jitter_max',
+              'realtime']
+
+
+class _SharedFrames():
+    # frames column layout: angles..., duration (nan for a plain frame)
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __getitem__(self, index):
+        row = self.frames[index]
+        angles = row[:-1].tolist()
+        duration = row[-1]
+        if np.isnan(duration):
+            return angles
+        return TimedFrame(angles, float(duration))
+
+    def __setitem__(self, index, frame):
+        if frame is None:
+            return
+        # a wider frame would not fit the row, the extra values have no servo
+        self.frames[index, :-1] = frame[:self.frames.shape[1] - 1]
+        self.frames[index, -1] = getattr(frame, 'duration', np.nan)
+
+
+class SharedActionQueue(ActionQueue):
+    """
+    ActionQueue whose state lives in shared memory, usable from a forked child
+    """
+
+    CAPACITY = 1024     # frames
+
+    def __init__(self, width, capacity=CAPACITY, ctx=None):
+        """
+            SharedActionQueue init
+            width: values per frame, 8 for legs, 3 for head, 1 for tail
+            capacity: max frames queued
+            ctx: multiprocessing context, fork by default
+        """
+        if ctx is None:
+            ctx = multiprocessing.get_context('fork')
+        self.width = width
+        self.capacity = capacity
+        int_size = (HEADER_SIZE + capacity) * 8
+        float_size = (capacity * (width + 1) + 2 * width) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=int_size + float_size)
+        ints = np.ndarray((HEADER_SIZE + capacity,), dtype=np.int64, buffer=self.shm.buf)
+        floats = np.ndarray((capacity * (width + 1) + 2 * width,), dtype=np.float64,
+                            buffer=self.shm.buf, offset=int_size)
+        ints[:] = 0
+        floats[:] = 0
+        self.header = ints[:HEADER_SIZE]
+        self.header[INFLIGHT] = -1
+        self.header[SPEED] = 90
+        self._seqs = ints[HEADER_SIZE:]
+        self._items = _SharedFrames(floats[:capacity * (width + 1)].reshape(capacity, width + 1))
+        self._current = floats[capacity * (width + 1):capacity * (width + 1) + width]
+        self._positions = floats[capacity * (width + 1) + width:]
+        self._callbacks = []
+        self.lock = ctx.RLock()
+        self.not_empty = ctx.Condition(self.lock)
+        self.not_full = ctx.Condition(self.lock)
+        self.changed = ctx.Condition(self.lock)
+
+    def _field(index, cast=int, none=None):
+        # property backed by a header field, none: the value stored for None
+        def fget(self):
+            value = int(self.header[index])
+            return None if value == none else cast(value)
+
+        def fset(self, value):
+            self.header[index] = none if value is None else int(value)
+        return property(fget, fset)
+
+    _head = _field(HEAD)
+    _count = _field(COUNT)
+    _closed = _field(CLOSED, bool)
+    next_seq = _field(NEXT_SEQ)
+    inflight = _field(INFLIGHT, none=-1)
+    preempted = _field(PREEMPTED, bool)
+    speed = _field(SPEED)
+    del _field
+
+    @property
+    def current(self):
+        if not self.header[HAS_CURRENT]:
+            return None
+        return self._current.tolist()
+
+    @current.setter
+    def current(self, angles):
+        if angles is None:
+            self.header[HAS_CURRENT] = 0
+            return
+        self._current[:] = angles
+        self.header[HAS_CURRENT] = 1
+
+    @property
+    def positions(self):
+        return self._positions.tolist()
+
+    @positions.setter
+    def positions(self, angles):
+        if angles is not None:
+            self._positions[:] = angles
+
+    def add_done_callback(self, seq, fn):
+        # the frames are written in the child, wait for them in a thread of this process
+        if self.is_done(seq):
+            fn()
+            return
+
+        def _wait():
+            self.wait_done(seq)
+            fn()
+        t = threading.Thread(name='motion_done_callback', target=_wait)
+        t.daemon = True
+        t.start()
+
+    def release(self):
+        """
+        Free the shared memory, once the child has exited
+        """
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class MotionProcess():
+
+    def __init__(self, robots, queues, rate=MotionScheduler.RATE, head_transform=None, realtime=None):
+        """
+            MotionProcess init
+            robots: {'legs': Robot, 'head': Robot, 'tail': Robot}
+            queues: {'legs': SharedActionQueue, ...}, same keys
+            rate: scheduler ticks per second
+            head_transform: transform of the head channel, see MotionChannel
+            realtime: (priority, cpus) of the child scheduler, see MotionScheduler
+        """
+        self.ctx = multiprocessing.get_context('fork')
+        self.robots = robots
+        self.queues = queues
+        self.rate = rate
+        self.head_transform = head_transform
+        self.realtime = realtime
+        self.stop_event = self.ctx.Event()
+        self._stats = self.ctx.Array('d', len(STATS_KEYS), lock=False)
+        # writes, saved of every robot, the child does the servo writes
+        self._write_stats = self.ctx.Array('q', 2 * len(robots), lock=False)
+        # the child robots read their offsets from here, see set_offset
+        self._offsets = {name: self.ctx.Array('d', list(robot.offset), lock=False)
+                         for name, robot in robots.items()}
+        self.process = None
+
+    def _channel(self, name):
+        queue = self.queues[name]
+        return MotionChannel(name, self.robots[name], queue, lambda: queue.speed,
+                             transform=self.head_transform if name == 'head' else None,
+                             on_begin=lambda frame: setattr(queue, 'current', frame))
+
+    def _publish_stats(self, stats):
+        values = stats.as_dict()
+        for i, key in enumerate(STATS_KEYS):
+            self._stats[i] = values[key]
+        for i, robot in enumerate(self.robots.values()):
+            if hasattr(robot, 'write_stats'):
+                self._write_stats[2 * i] = robot.writes
+                self._write_stats[2 * i + 1] = robot.saved
+
+    def _run(self):
+        # Ctrl+C is handled by the parent, which stops this process
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if self.realtime is not None:
+            failed = lock_memory()
+            if failed:
+                print(f'\rmotion_process memory not locked: {failed}')
+        for name, offsets in self._offsets.items():
+            self.robots[name].offset = offsets
+        scheduler = MotionScheduler([self._channel(name) for name in self.queues],
+                                    rate=self.rate, on_tick=self._publish_stats,
+                                    realtime=self.realtime)
+        scheduler.start()
+        self.stop_event.wait()
+        scheduler.stop()
+
+    def start(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        self.stop_event.clear()
+        self.process = self.ctx.Process(name='motion_process', target=self._run)
+        self.process.daemon = True
+        self.process.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for queue in self.queues.values():
+            queue.close()
+        if self.process is not None:
+            self.process.join()
+            self.process = None
+
+    def set_offset(self, name, offsets):
+        """
+        Forward the servo offsets of a robot to the child, call it after Robot.set_offset
+        """
+        self._offsets[name][:] = list(offsets)
+
+    def stats(self):
+        """
+        TickStats.as_dict of the child scheduler
+        """
+        stats = dict(zip(STATS_KEYS, self._stats[:]))
+        stats['realtime'] = bool(stats['realtime'])
+        return stats
+
+    def write_stats(self):
+        """
+        ServoOutput.write_stats of the child robots, {name: {'writes', 'saved'}}
+        """
+        return {name: {'writes': self._write_stats[2 * i], 'saved': self._write_stats[2 * i + 1]}
+                for i, name in enumerate(self.robots)}
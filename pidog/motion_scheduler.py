@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Fixed rate motion scheduler
+
+One thread drives the legs, head and tail together at RATE ticks per
+second. Every tick each channel takes its next frame from its ActionQueue
+when idle, advances the interpolation toward it and writes the new
+positions, so all servos are updated from the same clock and the control
+period is known for balance loops.
+
+The interpolation follows Robot.servo_move: a frame is reached linearly in
+
+    total_time = max(1000 - 9.9 * speed, max_delta / max_dps * 1000) ms
+
+so actions keep their timing when Pidog switches between the per-part
+threads and the scheduler. A TimedFrame is reached in its own duration,
+still limited by max_dps. A frame set with ActionQueue.set_target
+interrupts the current move, so targets are followed within one tick.
+
+In real-time mode the scheduler thread runs under SCHED_FIFO, see realtime.
+"""
+
+import threading
+from time import sleep, monotonic
+from .realtime import JitterStats, set_thread_realtime
+
+
+class TickStats():
+    """
+    Timing statistics of the scheduler ticks, all times in seconds
+    """
+
+    def __init__(self, period):
+        self.lock = threading.Lock()
+        self.period = period
+        self.jitter = JitterStats(period)
+        self.realtime = False   # the scheduler thread runs under SCHED_FIFO
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.ticks = 0
+            self.overruns = 0
+            self.last_period = 0.0
+            self.max_period = 0.0
+            self.sum_period = 0.0
+            self.last_work = 0.0
+            self.max_work = 0.0
+            self.sum_work = 0.0
+        self.jitter.reset()
+
+    def update(self, period, work):
+        with self.lock:
+            self.ticks += 1
+            self.last_period = period
+            self.max_period = max(self.max_period, period)
+            self.sum_period += period
+            self.last_work = work
+            self.max_work = max(self.max_work, work)
+            self.sum_work += work
+            if work > self.period:
+                self.overruns += 1
+        self.jitter.update(period)
+
+    def as_dict(self):
+        jitter = self.jitter.as_dict()
+        with self.lock:
+            n = max(self.ticks, 1)
+            return {
+                'ticks': self.ticks,
+                'overruns': self.overruns,
+                'period': self.period,
+                'last_period': self.last_period,
+                'mean_period': self.sum_period / n,
+                'max_period': self.max_period,
+                'last_work': self.last_work,
+                'mean_work': self.sum_work / n,
+                'max_work': self.max_work,
+                'jitter_p50': jitter['p50'],
+                'jitter_p99': jitter['p99'],
+                'jitter_max': jitter['max'],
+                'realtime': self.realtime,
+            }
+
+
+class MotionChannel():
+    """
+    One servo group of the scheduler: a Robot fed from an ActionQueue
+    """
+
+    def __init__(self, name, robot, queue, speed, transform=None, on_begin=None):
+        """
+            MotionChannel init
+            name: channel name, 'legs', 'head' or 'tail'
+            robot: robot_hat Robot of the group
+            queue: ActionQueue of the frames
+            speed: function returning the current speed, 0 ~ 100
+            transform: function applied to a frame before it is written, e.g.
+                       limits and offsets, None for none
+            on_begin: function called with a frame when it starts, None for none
+        """
+        self.name = name
+        self.robot = robot
+        self.queue = queue
+        self.speed = speed
+        self.transform = transform
+        self.on_begin = on_begin
+        self.start = None
+        self.target = None
+        self.steps = 0
+        self.step = 0
+
+    def _begin(self, frame, period):
+        if self.on_begin is not None:
+            self.on_begin(frame)
+        target = list(frame) if self.transform is None else self.transform(frame)
+        self.start = list(self.robot.servo_positions)
+        self.target = target
+        max_delta = max(abs(t - s) for t, s in zip(target, self.start))
+        duration = getattr(frame, 'duration', None)
+        if duration is not None:
+            # TimedFrame, see trajectory
+            total_time = duration * 1000
+        else:
+            speed = min(max(self.speed(), 0), 100)
+            total_time = -9.9 * speed + 1000
+        total_time = max(total_time, max_delta / self.robot.max_dps * 1000)
+        self.steps = max(1, int(round(total_time / 1000 / period)))
+        self.step = 0
+
+    def tick(self, period):
+        """
+        Advance one tick
+
+        :return: True if the servos were written
+        :rtype: bool
+        """
+        if self.target is not None and self.queue.take_preempted():
+            # a newer target was set, leave the current move where it is
+            self.target = None
+            self.queue.task_done()
+        if self.target is None:
+            frame = self.queue.begin(timeout=0)
+            if frame is None:
+                return False
+            self._begin(frame, period)
+
+        self.step += 1
+        k = self.step / self.steps
+        positions = [s + (t - s) * k for s, t in zip(self.start, self.target)]
+        self.robot.servo_positions = positions
+        self.robot.servo_write_all(positions)
+        self.queue.positions = positions
+        if self.step >= self.steps:
+            self.target = None
+            self.queue.task_done()
+        return True
+
+
+class MotionScheduler():
+
+    RATE = 100      # ticks per second
+
+    def __init__(self, channels, rate=RATE, on_tick=None, realtime=None):
+        """
+            MotionScheduler init
+            channels: list of MotionChannel
+            rate: ticks per second
+            on_tick: function called with the TickStats after every tick, None for none
+            realtime: (priority, cpus) of the scheduler thread, see
+                      realtime.set_thread_realtime, None for the normal scheduler
+        """
+        self.channels = channels
+        self.rate = rate
+        self.on_tick = on_tick
+        self.realtime = realtime
+        self.period = 1.0 / rate
+        self.stats = TickStats(self.period)
+        self.running = False
+        self.thread = None
+
+    def _run(self):
+        if self.realtime is not None:
+            failed = set_thread_realtime(*self.realtime)
+            self.stats.realtime = not failed
+            if failed:
+                print(f'\r_motion_scheduler real-time not set: {", ".join(failed)}')
+        next_time = monotonic()
+        last_start = None
+        while self.running:
+            start = monotonic()
+            try:
+                for channel in self.channels:
+                    channel.tick(self.period)
+            except Exception as e:
+                print(f'\r_motion_scheduler Exception:{e}')
+                self.running = False
+                break
+            end = monotonic()
+            if last_start is not None:
+                self.stats.update(start - last_start, end - start)
+                if self.on_tick is not None:
+                    self.on_tick(self.stats)
+            last_start = start
+
+            next_time += self.period
+            delay = next_time - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:
+                # overrun, restart the clock instead of catching up
+                next_time = monotonic()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(name='motion_scheduler_thread', target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -1,16 +1,29 @@
 #!/usr/bin/env python3
 import os
 import sys
-from time import sleep, time
+from time import sleep, time, monotonic
 from multiprocessing import Process, Value, Lock
 import threading
 import numpy as np
-from math import pi, sin, cos, sqrt, acos, atan2, atan
-from robot_hat import Robot, Pin, Ultrasonic, utils, Music, I2C
+from math import pi, sqrt, acos, atan2
+from robot_hat import Pin, Ultrasonic, utils, Music, I2C
 from .sh3001 import Sh3001
 from .rgb_strip import RGBStrip
 from .sound_direction import SoundDirection
 from .dual_touch import DualTouch
+from . import kinematics
+from .ik_table import IKTable
+from .gait import splice_cycle
+from .action_queue import ActionQueue, MotionGroup
+from .motion_scheduler import MotionScheduler, MotionChannel
+from .motion_process import MotionProcess, SharedActionQueue
+from .trajectory import Trajectory, retime
+from .servo_output import ServoOutput
+from .realtime import JitterStats, set_thread_realtime, lock_memory, default_cpus
+from .attitude import MahonyFilter, Attitude, sensor2body
+from .gpio_edge import EdgeEvent, PinEdge
+from .imu_ring import ImuRing, batch_timestamps
+from .imu_events import ImuEvents
 import warnings
 warnings.filterwarnings("ignore") # ignore warnings for pygame # not work
 
@@ -43,6 +56,7 @@ is_run_with_root = (os.geteuid() == 0)
 User = os.popen('echo ${SUDO_USER:-$LOGNAME}').readline().strip()
 UserHome = os.popen('getent passwd %s | cut -d: -f 6' %User).readline().strip()
 config_file = '%s/.config/pidog/pidog.conf' % UserHome
+action_bank_file = '%s/.config/pidog/actions.bank' % UserHome
 
 # color:
 # https://gist.github.com/rene-d/9e584a7dd2935d0f461904b9f2950007
@@ -72,18 +86,6 @@ def error(msg, end='\n', file=sys.stdout, flush=False):
     print_color(msg, end=end, file=file, flush=flush, color=RED)
 
 
-def compare_version(original_version, object_version):
-    or_v = tuple(int(val) for val in original_version.split('.'))
-    ob_v = tuple(int(val) for val in object_version.split('.'))
-    return (or_v >= or_v)
-    
-if compare_version(np.__version__, '2.0.0'):
-    def numpy_mat(data):
-        return np.asmatrix(data)
-else:
-    def numpy_mat(data):
-        return numpy_mat(data)
-
 class Pidog():
 
     # structure constants
@@ -91,11 +93,7 @@ class Pidog():
     FOOT = 76
     BODY_LENGTH = 117
     BODY_WIDTH = 98
-    BODY_STRUCT = numpy_mat([
-        [-BODY_WIDTH / 2, -BODY_LENGTH / 2,  0],
-        [BODY_WIDTH / 2, -BODY_LENGTH / 2,  0],
-        [-BODY_WIDTH / 2,  BODY_LENGTH / 2,  0],
-        [BODY_WIDTH / 2,  BODY_LENGTH / 2,  0]]).T
+    BODY_STRUCT = kinematics.BODY_STRUCT  # one row per leg
     SOUND_DIR = f"{UserHome}/pidog/sounds/"
     # Servo Speed
     # HEAD_DPS = 300
@@ -104,6 +102,10 @@ class Pidog():
     HEAD_DPS = 300   # dps, degrees per second
     LEGS_DPS = 428
     TAIL_DPS = 500
+    # Servo acceleration limits for retime
+    HEAD_DPSS = 3000   # dpss, degrees per second squared
+    LEGS_DPSS = 4000
+    TAIL_DPSS = 6000
     # PID Constants
     KP = 0.033
     KI = 0.0
@@ -116,6 +118,17 @@ class Pidog():
 
     HEAD_PITCH_OFFSET = 45
 
+    SERVO_DEADBAND = 0      # PWM counts a servo may change without being rewritten, see ServoOutput
+    TRAJECTORY_RATE = 50    # frames per second of trajectories without the motion scheduler
+    IMU_PERIOD = 0.01       # s
+    IMU_ODR = 500           # Hz, SH3001 output data rate, see Sh3001.sh3001_init
+    IMU_FIFO_WATERMARK = 5  # samples, FIFO watermark interrupt level
+    IMU_INT_TIMEOUT = 0.1   # s, read anyway when no interrupt came in this time
+
+    # SCHED_FIFO priorities in real-time mode, see realtime
+    MOTION_PRIORITY = 50
+    IMU_PRIORITY = 45
+
     HEAD_YAW_MIN = -90
     HEAD_YAW_MAX = 90
     HEAD_ROLL_MIN = -70
@@ -123,9 +136,51 @@ class Pidog():
     HEAD_PITCH_MIN = -45
     HEAD_PITCH_MAX = 30
 
+    # IK mode, see set_ik_mode
+    ik_table = None
+
+    # current angles and speed of each part live in its action queue, so they are
+    # shared with the motion process
+    def _queue_attr(buffer, attr):
+        return property(lambda self: getattr(getattr(self, buffer), attr),
+                        lambda self, value: setattr(getattr(self, buffer), attr, value))
+
+    leg_current_angles = _queue_attr('legs_action_buffer', 'current')
+    head_current_angles = _queue_attr('head_action_buffer', 'current')
+    tail_current_angles = _queue_attr('tail_action_buffer', 'current')
+    legs_speed = _queue_attr('legs_action_buffer', 'speed')
+    head_speed = _queue_attr('head_action_buffer', 'speed')
+    tail_speed = _queue_attr('tail_action_buffer', 'speed')
+    del _queue_attr
+
     # init
     def __init__(self, leg_pins=DEFAULT_LEGS_PINS, head_pins=DEFAULT_HEAD_PINS, tail_pin=DEFAULT_TAIL_PIN,
-                 leg_init_angles=None, head_init_angles=None, tail_init_angle=None):
+                 leg_init_angles=None, head_init_angles=None, tail_init_angle=None, motion_rate=None,
+                 motion_process=False, realtime=False, imu_fifo=False, imu_interrupt=None):
+        '''
+        :param motion_rate: if set, drive legs, head and tail from one MotionScheduler
+                            thread at this rate (ticks per second) instead of one
+                            thread per part
+        :type motion_rate: int
+        :param motion_process: run the MotionScheduler in a separate process fed through
+                               shared memory, so application load does not disturb
+                               servo timing, at motion_rate or MotionScheduler.RATE.
+                               The child has its own copy of the robots, only the
+                               offsets of set_*_offset(s) are forwarded to it
+        :type motion_process: bool
+        :param realtime: run the motion and IMU threads under SCHED_FIFO, pinned to the
+                         last core on a multi-core Pi, and lock the memory. Falls back
+                         to the normal scheduler without the privileges, see
+                         get_realtime_stats
+        :type realtime: bool
+        :param imu_fifo: read every IMU sample (IMU_ODR) from the SH3001 FIFO in bursts
+                         instead of one sample per IMU_PERIOD
+        :type imu_fifo: bool
+        :param imu_interrupt: robot_hat pin wired to the SH3001 INT pin, or an EdgeEvent.
+                              The IMU thread then waits for the data ready interrupt
+                              (FIFO watermark with imu_fifo) instead of sleeping
+        :type imu_interrupt: str
+        '''
 
 
         utils.reset_mcu()
@@ -133,16 +188,15 @@ class Pidog():
 
         from .actions_dictionary import ActionDict
         self.actions_dict = ActionDict()
+        if os.path.isfile(action_bank_file):
+            try:
+                self.actions_dict.load_bank(action_bank_file)
+            except (OSError, ValueError) as e:
+                warn(f"action bank not loaded: {e}")
 
         self.body_height = 80
-        self.pose = numpy_mat([0.0,  0.0,  self.body_height]).T  # target position vector
+        self.pose = np.array([0.0,  0.0,  self.body_height])  # target position vector
         self.rpy = np.array([0.0,  0.0,  0.0]) * pi / 180  # Euler angle, converted to radian value
-        self.leg_point_struc = numpy_mat([
-            [-self.BODY_WIDTH / 2, -self.BODY_LENGTH / 2,  0],
-            [self.BODY_WIDTH / 2, -self.BODY_LENGTH / 2,  0],
-            [-self.BODY_WIDTH / 2,  self.BODY_LENGTH / 2,  0],
-            [self.BODY_WIDTH / 2,  self.BODY_LENGTH / 2,  0]
-        ]).T
         self.pitch = 0
         self.roll = 0
 
@@ -164,29 +218,47 @@ class Pidog():
 
         self.thread_list = []
 
+        self.realtime = realtime
+        self.realtime_cpus = default_cpus() if realtime else None
+        self.realtime_threads = {}  # thread name -> SCHED_FIFO applied
+        self.memory_locked = False
+        motion_realtime = (self.MOTION_PRIORITY, self.realtime_cpus) if realtime else None
+
         try:
             debug(f"config_file: {config_file}")
             debug("robot_hat init ... ", end='', flush=True)
-            self.legs = Robot(pin_list=leg_pins, name='legs', init_angles=leg_init_angles, init_order=[
-                            0, 2, 4, 6, 1, 3, 5, 7], db=config_file)
-            self.head = Robot(pin_list=head_pins, name='head',
-                            init_angles=head_init_angles, db=config_file)
-            self.tail = Robot(pin_list=tail_pin, name='tail',
-                            init_angles=tail_init_angle, db=config_file)
+            self.legs = ServoOutput(pin_list=leg_pins, name='legs', init_angles=leg_init_angles, init_order=[
+                            0, 2, 4, 6, 1, 3, 5, 7], db=config_file, deadband=self.SERVO_DEADBAND)
+            self.head = ServoOutput(pin_list=head_pins, name='head',
+                            init_angles=head_init_angles, db=config_file, deadband=self.SERVO_DEADBAND)
+            self.tail = ServoOutput(pin_list=tail_pin, name='tail',
+                            init_angles=tail_init_angle, db=config_file, deadband=self.SERVO_DEADBAND)
             # add thread
-            self.thread_list.extend(["legs", "head", "tail"])
+            if motion_process:
+                self.thread_list.append("motion_process")
+            elif motion_rate:
+                self.thread_list.append("motion")
+            else:
+                self.thread_list.extend(["legs", "head", "tail"])
             # via
             self.legs.max_dps = self.LEGS_DPS
             self.head.max_dps = self.HEAD_DPS
             self.tail.max_dps = self.TAIL_DPS
 
-            self.legs_action_buffer = []
-            self.head_action_buffer = []
-            self.tail_action_buffer = []
+            if motion_process:
+                self.legs_action_buffer = SharedActionQueue(len(leg_pins))
+                self.head_action_buffer = SharedActionQueue(len(head_pins))
+                self.tail_action_buffer = SharedActionQueue(len(tail_pin))
+            else:
+                self.legs_action_buffer = ActionQueue()
+                self.head_action_buffer = ActionQueue()
+                self.tail_action_buffer = ActionQueue()
+            self.legs_cycle = None
 
-            self.legs_thread_lock = threading.Lock()
-            self.head_thread_lock = threading.Lock()
-            self.tail_thread_lock = threading.Lock()
+            # the queue locks, reentrant, hold them to group queue operations
+            self.legs_thread_lock = self.legs_action_buffer.lock
+            self.head_thread_lock = self.head_action_buffer.lock
+            self.tail_thread_lock = self.tail_action_buffer.lock
 
             self.legs_actions_coords_buffer = []
 
@@ -198,6 +270,27 @@ class Pidog():
             self.head_speed = 90
             self.tail_speed = 90
 
+            self.motion_scheduler = None
+            self.motion_process = None
+            if motion_process:
+                self.motion_process = MotionProcess(
+                    {'legs': self.legs, 'head': self.head, 'tail': self.tail},
+                    {'legs': self.legs_action_buffer, 'head': self.head_action_buffer,
+                     'tail': self.tail_action_buffer},
+                    rate=motion_rate or MotionScheduler.RATE,
+                    head_transform=self.head_angles_transform,
+                    realtime=motion_realtime)
+            elif motion_rate:
+                self.motion_scheduler = MotionScheduler([
+                    MotionChannel('legs', self.legs, self.legs_action_buffer, lambda: self.legs_speed,
+                                  on_begin=lambda frame: setattr(self, 'leg_current_angles', list(frame))),
+                    MotionChannel('head', self.head, self.head_action_buffer, lambda: self.head_speed,
+                                  transform=self.head_angles_transform,
+                                  on_begin=lambda frame: setattr(self, 'head_current_angles', list(frame))),
+                    MotionChannel('tail', self.tail, self.tail_action_buffer, lambda: self.tail_speed,
+                                  on_begin=lambda frame: setattr(self, 'tail_current_angles', list(frame))),
+                ], rate=motion_rate, realtime=motion_realtime)
+
             # done
             debug("done")
         except OSError:
@@ -212,6 +305,16 @@ class Pidog():
             self.accData = [0, 0, 0]  # ax,ay,az
             self.gyroData = [0, 0, 0]  # gx,gy,gz
             self.imu_fail_count = 0
+            self.imu_fifo = imu_fifo
+            self.imu_interrupt = imu_interrupt
+            self.imu_jitter = JitterStats(self.IMU_PERIOD)
+            # pitch and roll fused from the accelerometer and the gyro, see attitude
+            self.attitude_filter = MahonyFilter()
+            self.attitude = Attitude(None, 0.0, 0.0, 0.0)
+            # timestamped history of the samples, see ImuRing
+            self.imu_ring = ImuRing()
+            # on chip motion detectors, see ImuEvents
+            self.imu_events = ImuEvents(self.imu)
             # add imu thread
             self.thread_list.append("imu")
             debug("done")
@@ -259,6 +362,11 @@ class Pidog():
         self.sensory_lock = Lock()
 
         self.exit_flag = False
+        if realtime:
+            failed = lock_memory()
+            self.memory_locked = failed is None
+            if failed:
+                warn(f"real-time: memory not locked, {failed}")
         self.action_threads_start()
         self.sensory_process_start()
 
@@ -268,6 +376,13 @@ class Pidog():
     # action related: legs,head,tail,imu,rgb_strip
     def close_all_thread(self):
         self.exit_flag = True
+        # wake up the action threads waiting for frames
+        for buffer in (self.legs_action_buffer, self.head_action_buffer, self.tail_action_buffer):
+            buffer.close()
+        if 'motion' in self.thread_list:
+            self.motion_scheduler.stop()
+        if 'motion_process' in self.thread_list:
+            self.motion_process.stop()
 
     def close(self):
         import signal
@@ -301,9 +416,10 @@ class Pidog():
             if hasattr(self, 'ultrasonic') and self.ultrasonic:
                 self.ultrasonic.close()
 
-            self.legs_thread.join()
-            self.head_thread.join()
-            self.tail_thread.join()
+            if 'legs' in self.thread_list:
+                self.legs_thread.join()
+                self.head_thread.join()
+                self.tail_thread.join()
 
             if 'rgb' in self.thread_list:
                 self.rgb_thread_run = False
@@ -311,8 +427,13 @@ class Pidog():
                 self.rgb_strip.close()
             if 'imu' in self.thread_list:
                 self.imu_thread.join()
+                self.imu_ring.release()
+                self.imu_events.close()
             if self.sensory_process != None:
                 self.sensory_process.terminate()
+            if 'motion_process' in self.thread_list:
+                for buffer in (self.legs_action_buffer, self.head_action_buffer, self.tail_action_buffer):
+                    buffer.release()
 
             info('Quit')
 
@@ -324,6 +445,8 @@ class Pidog():
             # sys.exit(0)
 
     def legs_simple_move(self, angles_list, speed=90):
+        # writes the servos from this process, with motion_process the child
+        # does not see these positions
 
         tt = time()
 
@@ -355,6 +478,13 @@ class Pidog():
     def action_threads_start(self):
         # Immutable objects int, float, string, tuple, etc., need to be declared with global
         # Variable object lists, dicts, instances of custom classes, etc., do not need to be declared with global
+        for buffer in (self.legs_action_buffer, self.head_action_buffer, self.tail_action_buffer):
+            buffer.open()
+        # fork the motion process before any other thread is started
+        if 'motion_process' in self.thread_list:
+            self.motion_process.start()
+        if 'motion' in self.thread_list:
+            self.motion_scheduler.start()
         if 'legs' in self.thread_list:
             self.legs_thread = threading.Thread(name='legs_thread', target=self._legs_action_thread)
             self.legs_thread.daemon = True
@@ -378,51 +508,124 @@ class Pidog():
 
     # legs
     def _legs_action_thread(self):
+        self._thread_realtime('legs', self.MOTION_PRIORITY)
         while not self.exit_flag:
             try:
-                with self.legs_thread_lock:
-                    self.leg_current_angles = list.copy(self.legs_action_buffer[0])
-                # Release lock after copying data before the next operations
-                self.legs.servo_move(self.leg_current_angles, self.legs_speed)
-                with self.legs_thread_lock:
-                    self.legs_action_buffer.pop(0)
-            except IndexError:
-                sleep(0.001)
+                # block until a frame is queued, None when woken up by close_all_thread
+                frame = self.legs_action_buffer.begin()
+                if frame is None:
+                    continue
+                self.leg_current_angles = list.copy(frame)
+                self._servo_move(self.legs, self.leg_current_angles, self.legs_speed, frame)
+                self.legs_action_buffer.task_done()
             except Exception as e:
                 error(f'\r_legs_action_thread Exception:{e}')
                 break
 
     # head
     def _head_action_thread(self):
+        self._thread_realtime('head', self.MOTION_PRIORITY)
         while not self.exit_flag:
             try:
-                with self.head_thread_lock:
-                    self.head_current_angles = list.copy(self.head_action_buffer[0])
-                    self.head_action_buffer.pop(0)
-                # Release lock after copying data before the next operations
-                _angles = list.copy(self.head_current_angles)
-                _angles[0] = self.limit(self.HEAD_YAW_MIN, self.HEAD_YAW_MAX, _angles[0])
-                _angles[1] = self.limit(self.HEAD_ROLL_MIN, self.HEAD_ROLL_MAX, _angles[1])
-                _angles[2] = self.limit(self.HEAD_PITCH_MIN, self.HEAD_PITCH_MAX, _angles[2])
-                _angles[2] += self.HEAD_PITCH_OFFSET
-                self.head.servo_move(_angles, self.head_speed)
-            except IndexError:
-                sleep(0.001)
+                frame = self.head_action_buffer.begin()
+                if frame is None:
+                    continue
+                self.head_current_angles = list.copy(frame)
+                self._servo_move(self.head, self.head_angles_transform(frame), self.head_speed, frame)
+                self.head_action_buffer.task_done()
             except Exception as e:
                 error(f'\r_head_action_thread Exception:{e}')
                 break
 
+    def _thread_realtime(self, name, priority):
+        # called by a thread on itself in real-time mode
+        if not self.realtime:
+            return
+        failed = set_thread_realtime(priority, self.realtime_cpus)
+        self.realtime_threads[name] = not failed
+        if failed:
+            warn(f"\rreal-time: {name} thread not set, {', '.join(failed)}")
+
+    def _servo_move(self, robot, angles, speed, frame):
+        duration = getattr(frame, 'duration', None)
+        if duration is None:
+            robot.servo_move(angles, speed)
+            return
+        # TimedFrame, see trajectory: reach it in its duration, holds included
+        duration = max(duration, 0.01)
+        start = time()
+        robot.servo_move(angles, speed, bpm=60 / duration)
+        rest = duration - (time() - start)
+        if rest > 0:
+            sleep(rest)
+
+    def head_angles_transform(self, angles):
+        # head angles to servo angles: limits and pitch offset
+        _angles = list.copy(angles)
+        _angles[0] = self.limit(self.HEAD_YAW_MIN, self.HEAD_YAW_MAX, _angles[0])
+        _angles[1] = self.limit(self.HEAD_ROLL_MIN, self.HEAD_ROLL_MAX, _angles[1])
+        _angles[2] = self.limit(self.HEAD_PITCH_MIN, self.HEAD_PITCH_MAX, _angles[2])
+        _angles[2] += self.HEAD_PITCH_OFFSET
+        return _angles
+
+    def get_servo_write_stats(self):
+        '''
+        Servo channel writes done and skipped by the deduplication of ServoOutput,
+        with motion_process the ones of the child process, which does the writes
+
+        :return: {'legs': {'writes', 'saved'}, 'head': ..., 'tail': ...}
+        :rtype: dict
+        '''
+        if self.motion_process is not None:
+            return self.motion_process.write_stats()
+        return {'legs': self.legs.write_stats(),
+                'head': self.head.write_stats(),
+                'tail': self.tail.write_stats()}
+
+    def get_motion_stats(self):
+        '''
+        Tick timing statistics of the motion scheduler, see TickStats.as_dict
+
+        :return: statistics, None if the motion scheduler is not used
+        :rtype: dict
+        '''
+        if self.motion_process is not None:
+            return self.motion_process.stats()
+        if self.motion_scheduler is None:
+            return None
+        return self.motion_scheduler.stats.as_dict()
+
+    def get_realtime_stats(self):
+        '''
+        Real-time mode status and IMU loop jitter, the motion jitter is in
+        get_motion_stats
+
+        :return: {'enabled', 'memory_locked', 'cpus', 'threads': {name: SCHED_FIFO applied},
+                  'imu_jitter': {'p50', 'p99', 'max'} in seconds, None without IMU}
+        :rtype: dict
+        '''
+        threads = dict(self.realtime_threads)
+        motion_stats = self.get_motion_stats()
+        if self.realtime and motion_stats is not None:
+            threads['motion'] = motion_stats['realtime']
+        imu_jitter = self.imu_jitter.as_dict() if 'imu' in self.thread_list else None
+        return {'enabled': self.realtime,
+                'memory_locked': self.memory_locked,
+                'cpus': self.realtime_cpus,
+                'threads': threads,
+                'imu_jitter': imu_jitter}
+
     # tail
     def _tail_action_thread(self):
+        self._thread_realtime('tail', self.MOTION_PRIORITY)
         while not self.exit_flag:
             try:
-                with self.tail_thread_lock:
-                    self.tail_current_angles = list.copy(self.tail_action_buffer[0])
-                    self.tail_action_buffer.pop(0)
-                # Release lock after copying data before the next operations
-                self.tail.servo_move(self.tail_current_angles, self.tail_speed)
-            except IndexError:
-                sleep(0.001)
+                frame = self.tail_action_buffer.begin()
+                if frame is None:
+                    continue
+                self.tail_current_angles = list.copy(frame)
+                self._servo_move(self.tail, self.tail_current_angles, self.tail_speed, frame)
+                self.tail_action_buffer.task_done()
             except Exception as e:
                 error(f'\r_tail_action_thread Exception:{e}')
                 break
@@ -443,6 +646,7 @@ class Pidog():
     # IMU
 
     def _imu_thread(self):
+        self._thread_realtime('imu', self.IMU_PRIORITY)
         # imu calibrate
         _ax = 0
         _ay = 0
@@ -472,39 +676,115 @@ class Pidog():
         self.imu_gyro_offset[1] = round(0 - _gy/time, 0)
         self.imu_gyro_offset[2] = round(0 - _gz/time, 0)
 
+        if self.imu_fifo:
+            self.imu.fifo_config(watermark=self.IMU_FIFO_WATERMARK * self.imu.fifo_frame_size)
+        edge = self._imu_interrupt_start()
+
+        # read every IMU_PERIOD from a fixed clock, or on the interrupts, the period
+        # error is the jitter
+        next_time = monotonic()
+        last_start = None
+        interrupt_time = None
         while not self.exit_flag:
+            start = monotonic()
+            if last_start is not None:
+                self.imu_jitter.update(start - last_start)
+            last_start = start
             try:
-                data = self.imu._sh3001_getimudata()
+                if self.imu_fifo:
+                    data = self.imu.fifo_read()
+                else:
+                    data = self.imu._sh3001_getimudata()
                 if data == False:
                     self.imu_fail_count += 1
                     if self.imu_fail_count > 10:
                         error('\r_imu_thread imu data error')
                         break
-                self.accData, self.gyroData = data
-                self.accData[0] += self.imu_acc_offset[0]
-                self.accData[1] += self.imu_acc_offset[1]
-                self.accData[2] += self.imu_acc_offset[2]
-                self.gyroData[0] += self.imu_gyro_offset[0]
-                self.gyroData[1] += self.imu_gyro_offset[1]
-                self.gyroData[2] += self.imu_gyro_offset[2]
-                ax = self.accData[0]
-                ay = self.accData[1]
-                az = self.accData[2]
-                ay = -ay
-                az = -az
-
-                self.pitch = atan(ay/sqrt(ax*ax+az*az))*57.2957795
-                self.roll = atan(az/sqrt(ax*ax+ay*ay))*57.2957795
+                timestamp = monotonic()
+                # detector events, at the interrupt time when woken up by one
+                self.imu_events.poll(interrupt_time or timestamp)
+                if self.imu_fifo:
+                    # the FIFO samples are 1 / IMU_ODR apart, the last one is the newest,
+                    # a batch never overlaps the previous one so the ring stays sorted
+                    timestamps = batch_timestamps(len(data), timestamp, self.attitude.timestamp,
+                                                  1 / self.IMU_ODR)
+                    for (accData, gyroData), sample_time in zip(data, timestamps):
+                        self._imu_sample(accData, gyroData, sample_time, 1 / self.IMU_ODR)
+                else:
+                    accData, gyroData = data
+                    self._imu_sample(accData, gyroData, timestamp)
 
                 self.imu_fail_count = 0
-                sleep(0.05)
+                if edge is not None:
+                    interrupt_time = edge.timestamp if edge.wait(self.IMU_INT_TIMEOUT) else None
+                    continue
+                next_time += self.IMU_PERIOD
+                delay = next_time - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                else:
+                    next_time = monotonic()
             except Exception as e:
                 self.imu_fail_count += 1
+                # a quick retry is not a period
+                last_start = None
                 sleep(0.001)
                 if self.imu_fail_count > 10:
                     error(f'\r_imu_thread Exception:{e}')
                     self.exit_flag = True
                     break
+        if edge is not None:
+            edge.close()
+
+    def _imu_interrupt_start(self):
+        # data ready, or FIFO watermark, interrupt of the IMU thread, None to poll
+        if self.imu_interrupt is None:
+            return None
+        edge = None
+        try:
+            if isinstance(self.imu_interrupt, EdgeEvent):
+                edge = self.imu_interrupt
+            else:
+                edge = PinEdge(self.imu_interrupt)
+            if self.imu_fifo:
+                int_type = self.imu.SH3001_INT_ACC_FIFO
+                period = self.IMU_FIFO_WATERMARK / self.IMU_ODR
+            else:
+                int_type = self.imu.SH3001_INT_ACC_READY
+                period = 1 / self.IMU_ODR
+            # latched when the detectors are used, see ImuEvents
+            if self.imu_events.enabled:
+                self.imu.int_config(latch=self.imu.SH3001_INT_LATCH)
+            else:
+                self.imu.int_config()
+            self.imu.int_enable(int_type)
+        except Exception as e:
+            warn(f"\rimu interrupt not available, polling: {e}")
+            if edge is not None:
+                edge.close()
+            return None
+        self.imu_jitter = JitterStats(period)
+        return edge
+
+    def _imu_sample(self, accData, gyroData, timestamp, dt=None):
+        # apply the offsets and update the attitude, dt: s since the previous sample,
+        # from the timestamps if None
+        self.accData = [a + o for a, o in zip(accData, self.imu_acc_offset)]
+        self.gyroData = [g + o for g, o in zip(gyroData, self.imu_gyro_offset)]
+        acc, gyro = sensor2body(self.accData, self.gyroData)
+        last = self.attitude.timestamp
+        if last is None:
+            self.attitude_filter.reset(acc)
+            self.attitude_filter.timestamp = timestamp
+            attitude = self.attitude_filter.attitude()
+        else:
+            attitude = self.attitude_filter.update(acc, gyro, timestamp - last if dt is None else dt,
+                                                   timestamp)
+        self.attitude = attitude
+        self.pitch = attitude.pitch
+        self.roll = attitude.roll
+        self.imu_ring.append(timestamp, self.accData, self.gyroData,
+                             attitude.pitch, attitude.roll, attitude.yaw)
 
     # clear actions buff
     def legs_stop(self):
@@ -534,6 +814,41 @@ class Pidog():
         self.legs_speed = speed
         with self.legs_thread_lock:
             self.legs_action_buffer += target_angles
+            # not a known cycle any more, see do_action splice
+            self.legs_cycle = None
+            return self.legs_action_buffer.handle()
+
+    def legs_velocity_move(self, velocities, dt, speed=100):
+        '''
+        Move the feet with Cartesian velocities for dt seconds, for small
+        incremental corrections at high rate (balance, leaning, pushing).
+        The joint step comes from the leg Jacobian instead of a full IK solve
+        and is integrated from the latest legs target, the pending frames are
+        replaced so the newest command always wins.
+
+        :param velocities: foot velocities in leg coords, [[vy, vz]] * 4, mm/s
+        :type velocities: list
+        :param dt: command period, s
+        :type dt: float
+        :param speed: speed of the legs servos
+        :type speed: int
+        :return: the new legs target angles
+        :rtype: list
+        '''
+        with self.legs_thread_lock:
+            if len(self.legs_action_buffer) > 0:
+                last = self.legs_action_buffer[-1]
+            else:
+                last = self.leg_current_angles
+            alpha, beta = kinematics.angles2polar(last)
+            alpha_rate, beta_rate = kinematics.foot_velocity2polar_rate(
+                alpha, beta, velocities, self.LEG, self.FOOT)
+            angles = kinematics.polar2angles(alpha + alpha_rate * dt, beta + beta_rate * dt).tolist()
+            self.legs_speed = speed
+            # keep only the frame being written, replace the pending ones
+            self.legs_action_buffer.set_target(angles)
+            self.legs_cycle = None
+        return angles
         
     def head_rpy_to_angle(self, target_yrp, roll_comp=0, pitch_comp=0):
         yaw, roll, pitch = target_yrp
@@ -554,6 +869,7 @@ class Pidog():
 
         with self.head_thread_lock:
             self.head_action_buffer += angles
+            return self.head_action_buffer.handle()
 
     def head_move_raw(self, target_angles, immediately=True, speed=50):
         if immediately == True:
@@ -561,6 +877,114 @@ class Pidog():
         self.head_speed = speed
         with self.head_thread_lock:
             self.head_action_buffer += target_angles
+            return self.head_action_buffer.handle()
+
+    def set_head_target(self, target_yrp, roll_comp=0, pitch_comp=0, speed=100):
+        '''
+        Non-blocking latest-wins head command for tracking: replaces the pending head
+        frames with this target instead of queueing or waiting (see ActionQueue.set_target).
+        With the motion scheduler the current move is interrupted at the next tick.
+
+        :param target_yrp: [yaw, roll, pitch]
+        :type target_yrp: list
+        :param roll_comp: roll compensation
+        :type roll_comp: float
+        :param pitch_comp: pitch compensation
+        :type pitch_comp: float
+        :param speed: speed
+        :type speed: int
+        :return: completion handle
+        :rtype: MotionHandle
+        '''
+        self.head_speed = speed
+        angles = self.head_rpy_to_angle(target_yrp, roll_comp, pitch_comp)
+        return self.head_action_buffer.set_target(angles)
+
+    def set_tail_target(self, target_angles, speed=100):
+        '''
+        Non-blocking latest-wins tail command, see set_head_target
+
+        :param target_angles: [angle]
+        :type target_angles: list
+        :param speed: speed
+        :type speed: int
+        :return: completion handle
+        :rtype: MotionHandle
+        '''
+        self.tail_speed = speed
+        return self.tail_action_buffer.set_target(list(target_angles))
+
+    def trajectory_move(self, part, keyframes, times, method=Trajectory.CUBIC, immediately=True):
+        '''
+        Move through timed keyframes, interpolated at the motion scheduler rate
+        (TRAJECTORY_RATE without it), so a few keyframes give a smooth motion
+
+        :param part: 'legs', 'head' or 'tail'
+        :type part: str
+        :param keyframes: servo angles of the part, as for legs_move, head_move_raw or tail_move
+        :type keyframes: list
+        :param times: timestamps of the keyframes in seconds, increasing
+        :type times: list
+        :param method: Trajectory.CUBIC or Trajectory.MIN_JERK
+        :type method: str
+        :param immediately: clear the frames queued before
+        :type immediately: bool
+        :return: completion handle
+        :rtype: MotionHandle
+        '''
+        if self.motion_scheduler is not None:
+            rate = self.motion_scheduler.rate
+        else:
+            rate = self.TRAJECTORY_RATE
+        frames = Trajectory(keyframes, times, method).frames(rate)
+        if part == 'legs':
+            return self.legs_move(frames, immediately=immediately)
+        elif part == 'head':
+            return self.head_move_raw(frames, immediately=immediately)
+        elif part == 'tail':
+            return self.tail_move(frames, immediately=immediately)
+        raise ValueError("part must be 'legs', 'head' or 'tail'")
+
+    def retime(self, part, frames, start=None, speed=None):
+        '''
+        Fastest timing of frames within the servo velocity (*_DPS) and acceleration
+        (*_DPSS) limits of a part, see trajectory.retime. Frames that do not move
+        (holds) keep the duration of speed. The duration is known before the frames
+        are played, e.g.
+
+            frames, duration = my_dog.retime('legs', my_dog.actions_dict['forward'][0] * 2)
+            my_dog.legs_move(frames, immediately=False)
+
+        :param part: 'legs', 'head' or 'tail'
+        :type part: str
+        :param frames: servo angles of the part, as for legs_move, head_move_raw or tail_move
+        :type frames: list
+        :param start: angles before the first frame, the last queued or current angles if None
+        :type start: list
+        :param speed: speed of the holds, 0 ~ 100 as for legs_move, the speed of the part if None
+        :type speed: int
+        :return: (timed frames, duration in seconds)
+        :rtype: tuple
+        '''
+        if part == 'legs':
+            buffer, current, dps, dpss = self.legs_action_buffer, self.leg_current_angles, self.LEGS_DPS, self.LEGS_DPSS
+            part_speed = self.legs_speed
+        elif part == 'head':
+            buffer, current, dps, dpss = self.head_action_buffer, self.head_current_angles, self.HEAD_DPS, self.HEAD_DPSS
+            part_speed = self.head_speed
+        elif part == 'tail':
+            buffer, current, dps, dpss = self.tail_action_buffer, self.tail_current_angles, self.TAIL_DPS, self.TAIL_DPSS
+            part_speed = self.tail_speed
+        else:
+            raise ValueError("part must be 'legs', 'head' or 'tail'")
+        if start is None:
+            with buffer.lock:
+                start = buffer[-1] if len(buffer) > 0 else current
+        if speed is None:
+            speed = part_speed
+        # same duration as Robot.servo_move at speed
+        hold_duration = (1000 - 9.9 * min(max(speed, 0), 100)) / 1000
+        return retime(frames, dps, dpss, start, hold_duration=hold_duration)
 
     def tail_move(self, target_angles, immediately=True, speed=50):
         if immediately == True:
@@ -568,6 +992,7 @@ class Pidog():
         self.tail_speed = speed
         with self.tail_thread_lock:
             self.tail_action_buffer += target_angles
+            return self.tail_action_buffer.handle()
         
     # ultrasonic
     def _ultrasonic_thread(self, distance_addr, lock):
@@ -617,7 +1042,7 @@ class Pidog():
             self.body_stop()
             self.legs_move(self.actions_dict['lie'][0], speed)
             self.head_move_raw([[0, 0, 0]], speed)
-            self.tail_move([[0, 0, 0]], speed)
+            self.tail_move([[0]], speed)
             self.wait_all_done()
             sleep(0.1)
         except Exception as e:
@@ -674,7 +1099,12 @@ class Pidog():
     # calibration
     def set_leg_offsets(self, cali_list, reset_list=None):
         self.legs.set_offset(cali_list)
-        if reset_list is None:
+        if self.motion_process is not None:
+            # the child does the writes with its own copy of the offsets
+            self.motion_process.set_offset('legs', self.legs.offset)
+            self.legs_move([reset_list or [0]*8], immediately=True, speed=80)
+            self.leg_current_angles = list(reset_list or [0]*8)
+        elif reset_list is None:
             self.legs.reset()
             self.leg_current_angles = [0]*8
         else:
@@ -684,24 +1114,30 @@ class Pidog():
 
     def set_head_offsets(self, cali_list):
         self.head.set_offset(cali_list)
+        if self.motion_process is not None:
+            self.motion_process.set_offset('head', self.head.offset)
         #self.head.reset()
         self.head_move([[0]*3], immediately=True, speed=80)
         self.head_current_angles = [0]*3
 
     def set_tail_offset(self, cali_list):
         self.tail.set_offset(cali_list)
-        self.tail.reset()
+        if self.motion_process is not None:
+            self.motion_process.set_offset('tail', self.tail.offset)
+            self.tail_move([[0]], immediately=True, speed=80)
+        else:
+            self.tail.reset()
         self.tail_current_angles = [0]
 
     # calculate angles and coords
 
     def set_pose(self, x=None, y=None, z=None):
         if x != None:
-            self.pose[0, 0] = float(x)
+            self.pose[0] = float(x)
         if y != None:
-            self.pose[1, 0] = float(y)
+            self.pose[1] = float(y)
         if z != None:
-            self.pose[2, 0] = float(z)
+            self.pose[2] = float(z)
 
     def set_rpy(self, roll=None, pitch=None, yaw=None, pid=False):
         if roll is None:
@@ -736,79 +1172,36 @@ class Pidog():
             self.rpy[2] = yaw / 180. * pi
 
     def set_legs(self, legs_list):
-        self.legpoint_struc = numpy_mat([
-            [-self.BODY_WIDTH / 2, -self.BODY_LENGTH / 2 +
-                legs_list[0][0], self.body_height - legs_list[0][1]],
-            [self.BODY_WIDTH / 2, -self.BODY_LENGTH / 2 +
-                legs_list[1][0], self.body_height - legs_list[1][1]],
-            [-self.BODY_WIDTH / 2,  self.BODY_LENGTH / 2 +
-                legs_list[2][0], self.body_height - legs_list[2][1]],
-            [self.BODY_WIDTH / 2,  self.BODY_LENGTH / 2 +
-                legs_list[3][0], self.body_height - legs_list[3][1]]
-        ]).T
+        self.legpoint_struc = kinematics.legs2points(legs_list, self.body_height)
 
     # pose and Euler Angle algorithm
     def pose2coords(self):
-        roll = self.rpy[0]
-        pitch = self.rpy[1]
-        yaw = self.rpy[2]
-
-        rotx = numpy_mat([
-            [cos(roll), 0, -sin(roll)],
-            [0, 1,           0],
-            [sin(roll), 0,  cos(roll)]])
-        roty = numpy_mat([
-            [1,         0,          0],
-            [0, cos(-pitch), -sin(-pitch)],
-            [0, sin(-pitch),  cos(-pitch)]])
-        rotz = numpy_mat([
-            [cos(yaw), -sin(yaw), 0],
-            [sin(yaw),  cos(yaw), 0],
-            [0,         0, 1]])
-        rot_mat = rotx * roty * rotz
-        AB = numpy_mat(np.zeros((3, 4)))
-        for i in range(4):
-            AB[:, i] = - self.pose - rot_mat * \
-                self.BODY_STRUCT[:, i] + self.legpoint_struc[:, i]
-
-        body_coor_list = []
-        for i in range(4):
-            body_coor_list.append([(self.legpoint_struc - AB).T[i, 0],
-                                  (self.legpoint_struc - AB).T[i, 1], (self.legpoint_struc - AB).T[i, 2]])
-
-        leg_coor_list = []
-        for i in range(4):
-            leg_coor_list.append(
-                [self.legpoint_struc.T[i, 0], self.legpoint_struc.T[i, 1], self.legpoint_struc.T[i, 2]])
-
-        return {"leg": leg_coor_list, "body": body_coor_list}
+        body_coor = kinematics.pose2body_points(self.pose, self.rpy)
+        return {"leg": self.legpoint_struc.tolist(), "body": body_coor.tolist()}
 
     def pose2legs_angle(self):
-        data = self.pose2coords()
-        leg_coor_list = data["leg"]
-        body_coor_list = data["body"]
-        coords = []
-        angles = []
-
-        for i in range(4):
-            coords.append([
-                leg_coor_list[i][1] - body_coor_list[i][1],
-                body_coor_list[i][2] - leg_coor_list[i][2]])
-
-        angles = []
+        angles = kinematics.points2legs_angle(
+            self.pose, self.rpy, self.legpoint_struc, self.LEG, self.FOOT, self.ik_table)
+        return angles.tolist()
 
-        for i, coord in enumerate(coords):
-
-            leg_angle, foot_angle = self.fieldcoord2polar(coord)
-            # The left and right sides are opposite
-            leg_angle = leg_angle
-            foot_angle = foot_angle-90
-            if i % 2 != 0:
-                leg_angle = -leg_angle
-                foot_angle = -foot_angle
-            angles += [leg_angle, foot_angle]
-
-        return angles
+    @classmethod
+    def poses2legs_angle(cls, poses, rpys, legs_lists, body_height=80):
+        """
+        Batch version of set_pose, set_rpy, set_legs and pose2legs_angle
+
+        :param poses: body positions [x, y, z], shape (N, 3)
+        :type poses: list or numpy.ndarray
+        :param rpys: body [roll, pitch, yaw] in radians, shape (N, 3)
+        :type rpys: list or numpy.ndarray
+        :param legs_lists: leg coords as passed to set_legs, shape (N, 4, 2)
+        :type legs_lists: list or numpy.ndarray
+        :param body_height: body height used by set_legs
+        :type body_height: int
+        :return: servo angles, shape (N, 8)
+        :rtype: numpy.ndarray
+        """
+        return kinematics.pose2legs_angle(
+            poses, rpys, legs_lists, body_height, cls.LEG, cls.FOOT, cls.ik_table)
 
     # Pose calculated coord is Field coord, acoord refer to field, not refer to robot
     def fieldcoord2polar(self, coord):
@@ -850,18 +1243,34 @@ class Pidog():
         return alpha, beta
 
     def polar2coord(self, angles):
-        alpha, beta, gamma = angles
+        alpha, beta = angles
+        y, z = kinematics.polar2coords(alpha, beta, self.LEG, self.FOOT)
+        return [round(y, 4), round(z, 4)]
 
-        L1 = sqrt(self.A**2+self.B**2-2*self.A*self.B*cos((90+alpha)/180*pi))
-        angle = acos((self.A**2+L1**2-self.B**2)/(2*self.A*L1))*180/pi
-        angle = 90 - beta - angle
-        L = L1*cos(angle*pi/180) + self.C
+    def get_legs_coords(self, offsets=None):
+        '''
+        Current foot positions, forward kinematics of leg_current_angles
 
-        x = L*sin((45+gamma)*pi/180)
-        y = L*cos((45+gamma)*pi/180)
-        z = L1*sin(angle*pi/180)
+        :param offsets: calibration correction in degrees added to the angles, 8 values
+        :type offsets: list
+        :return: leg coords, [[y, z]] * 4
+        :rtype: list
+        '''
+        return self.legs_coords_calculation_batch(self.leg_current_angles, offsets).tolist()
 
-        return [round(x, 4), round(y, 4), round(z, 4)]
+    @classmethod
+    def legs_coords_calculation_batch(cls, angles, offsets=None):
+        """
+        Vectorized forward kinematics, inverse of legs_angle_calculation_batch
+
+        :param angles: servo angles, shape (N frames, 8) or (8,)
+        :type angles: list or numpy.ndarray
+        :param offsets: calibration correction in degrees added to the angles, 8 values
+        :type offsets: list
+        :return: leg coords, shape (N frames, 4 legs, 2) or (4, 2)
+        :rtype: numpy.ndarray
+        """
+        return kinematics.legs_coords_calculation(angles, cls.LEG, cls.FOOT, offsets)
 
     @classmethod
     def legs_angle_calculation(cls, coords):  # 注意这里使用了 @classmethod
@@ -879,6 +1288,35 @@ class Pidog():
 
         return translate_list
 
+    @classmethod
+    def legs_angle_calculation_batch(cls, coords):
+        """
+        Vectorized legs_angle_calculation for a whole sequence of frames
+
+        :param coords: leg coords, shape (N frames, 4 legs, 2)
+        :type coords: list or numpy.ndarray
+        :return: servo angles, shape (N frames, 8)
+        :rtype: numpy.ndarray
+        """
+        return kinematics.legs_angle_calculation(coords, cls.LEG, cls.FOOT, cls.ik_table)
+
+    @classmethod
+    def set_ik_mode(cls, mode='exact'):
+        """
+        Select how the batch and pose IK paths solve leg angles
+
+        :param mode: 'exact' to solve with trigonometry, 'table' to interpolate
+                     from a precomputed table cached in the config directory,
+                     max error IKTable.MAX_ERROR degree
+        :type mode: str
+        """
+        if mode == 'exact':
+            cls.ik_table = None
+        elif mode == 'table':
+            cls.ik_table = IKTable(cls.LEG, cls.FOOT, cache_dir=os.path.dirname(config_file))
+        else:
+            raise ValueError("ik mode must be 'exact' or 'table'")
+
     # limit
     def limit(self, min, max, x):
         if x > max:
@@ -914,48 +1352,91 @@ class Pidog():
         self.servo_move(translate_list, speed)
 
     # do action
-    def do_action(self, action_name, step_count=1, speed=50, pitch_comp=0):
+    def do_action(self, action_name, step_count=1, speed=50, pitch_comp=0, splice=False):
+        '''
+        Do an action of ActionDict
+
+        :param action_name: action name
+        :type action_name: str
+        :param step_count: times to repeat the action
+        :type step_count: int
+        :param speed: speed, 0 ~ 100
+        :type speed: int
+        :param pitch_comp: pitch compensation of head actions
+        :type pitch_comp: float
+        :param splice: for legs actions, if a legs action is still playing, replace
+                       its remaining frames and continue with this one at the same
+                       phase with a short blend, instead of queueing it after
+        :type splice: bool
+        :return: completion handle of the action, None on error
+        :rtype: MotionHandle
+        '''
         try:
             actions, part = self.actions_dict[action_name]
             if part == 'legs':
-                for _ in range(step_count):
-                    self.legs_move(actions, immediately=False, speed=speed)
+                if splice and self._legs_splice(actions, step_count, speed):
+                    return self.legs_action_buffer.handle()
+                with self.legs_thread_lock:
+                    for _ in range(step_count):
+                        self.legs_move(actions, immediately=False, speed=speed)
+                    self.legs_cycle = (actions, 0)
+                    return self.legs_action_buffer.handle()
             elif part == 'head':
-                for _ in range(step_count):
-                    self.head_move(actions, pitch_comp=pitch_comp, immediately=False, speed=speed)
+                with self.head_thread_lock:
+                    for _ in range(step_count):
+                        self.head_move(actions, pitch_comp=pitch_comp, immediately=False, speed=speed)
+                    return self.head_action_buffer.handle()
             elif part == 'tail':
-                for _ in range(step_count):
-                    self.tail_move(actions, immediately=False, speed=speed)
+                with self.tail_thread_lock:
+                    for _ in range(step_count):
+                        self.tail_move(actions, immediately=False, speed=speed)
+                    return self.tail_action_buffer.handle()
         except KeyError:
             error("do_action: No such action")
         except Exception as e:
             error(f"do_action:{e}")
 
-    def wait_legs_done(self):
-        while not self.is_legs_done():
-            sleep(0.001)
-
-    def wait_head_done(self):
-        while not self.is_head_done():
-            sleep(0.001)
-
-    def wait_tail_done(self):
-        while not self.is_tail_done():
-            sleep(0.001)
-
-    def wait_all_done(self):
-        self.wait_legs_done()
-        self.wait_head_done()
-        self.wait_tail_done()
+    def _legs_splice(self, cycle, step_count, speed):
+        with self.legs_thread_lock:
+            remaining = len(self.legs_action_buffer)
+            if self.legs_cycle is None or remaining < 2:
+                return False
+            # legs_cycle: (frames of the queued cycle, its index after the last queued frame)
+            # buffer[0] is being played, the next frame is at index of the current cycle
+            current, end = self.legs_cycle
+            index = (end - remaining + 1) % len(current)
+            transition, start = splice_cycle(current, index, cycle)
+            count = len(cycle) * step_count - len(transition)
+            frames = transition + [cycle[(start + i) % len(cycle)] for i in range(count)]
+            self.legs_speed = speed
+            self.legs_action_buffer.truncate(1)
+            self.legs_action_buffer.extend(frames)
+            self.legs_cycle = (cycle, (start - len(transition)) % len(cycle))
+        return True
+
+    # wait for the frames queued so far to be written, return False on timeout
+    def wait_legs_done(self, timeout=None):
+        return self.legs_action_buffer.handle().wait(timeout)
+
+    def wait_head_done(self, timeout=None):
+        return self.head_action_buffer.handle().wait(timeout)
+
+    def wait_tail_done(self, timeout=None):
+        return self.tail_action_buffer.handle().wait(timeout)
+
+    def wait_all_done(self, timeout=None):
+        return MotionGroup([self.legs_action_buffer.handle(),
+                            self.head_action_buffer.handle(),
+                            self.tail_action_buffer.handle()]).wait(timeout)
 
     def is_legs_done(self):
-        return not bool(len(self.legs_action_buffer) > 0)
+        return self.legs_action_buffer.handle().done()
 
     def is_head_done(self):
-        return not bool(len(self.head_action_buffer) > 0)
+        return self.head_action_buffer.handle().done()
 
     def is_tail_done(self):
-        return not bool(len(self.tail_action_buffer) > 0)
+        return self.tail_action_buffer.handle().done()
 
     def is_all_done(self):
         return self.is_legs_done() and self.is_head_done() and self.is_tail_done()
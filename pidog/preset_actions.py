@@ -175,6 +175,15 @@ def shake_head_smooth(my_dog, pitch_comp=0, amplitude=40, speed=90):
     my_dog.wait_all_done()
 
 
+def doze_off_smooth(my_dog, period=5.4):
+    # the 'doze_off' action as 5 timed keyframes instead of 200 frames
+    def legs(a):
+        return [45, -30+a, -45, 30-a, 45, -45+a, -45, 45-a]
+    keyframes = [legs(0), legs(20), legs(20), legs(0), legs(0)]
+    times = [t * period / 5.4 for t in [0, 2.5, 2.7, 5.2, 5.4]]
+    return my_dog.trajectory_move('legs', keyframes, times, method='min_jerk', immediately=False)
+
+
 def bark(my_dog, yrp=None, pitch_comp=0, roll_comp=0, volume=100):
     if yrp is None:
         yrp = [0, 0, 0]
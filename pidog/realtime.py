@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Real-time execution of the motion and IMU threads
+
+On a loaded Pi the servo and IMU loops are delayed by other processes, by
+page faults and by core migrations. With real-time mode Pidog puts these
+threads under SCHED_FIFO, pins them to one core and locks the process memory:
+
+    set_thread_realtime: SCHED_FIFO priority and CPU affinity of the calling
+                         thread
+    lock_memory:         mlockall, current and future pages stay in RAM
+    default_cpus:        the last core on a multi-core Pi, add isolcpus=<n> to
+                         /boot/firmware/cmdline.txt to keep other tasks off it
+
+All of them need root or CAP_SYS_NICE / CAP_IPC_LOCK and RLIMIT_RTPRIO /
+RLIMIT_MEMLOCK. Without the privileges they report what failed and leave
+the thread as it is, so Pidog keeps running with the normal scheduler.
+
+JitterStats measures how far each loop period is from the nominal one.
+"""
+
+import os
+import ctypes
+import ctypes.util
+import threading
+from collections import deque
+import numpy as np
+
+PRIORITY = 50       # SCHED_FIFO priority, 1 ~ 99
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+def default_cpus():
+    """
+    Core for the real-time threads: the last one usable by this process,
+    None on a single core
+    """
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return None
+    if len(cpus) < 2:
+        return None
+    return {cpus[-1]}
+
+
+def set_thread_realtime(priority=PRIORITY, cpus=None):
+    """
+    Run the calling thread under SCHED_FIFO at priority, pinned to cpus
+
+    priority: SCHED_FIFO priority, 1 ~ 99, None to keep the policy
+    cpus: set of cores, None to keep the affinity
+    return: list of the settings that failed, empty if all applied
+    """
+    failed = []
+    if priority is not None:
+        try:
+            # pid 0 is the calling thread on Linux
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        except (AttributeError, OSError) as e:
+            failed.append(f'priority: {e}')
+    if cpus is not None:
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError) as e:
+            failed.append(f'affinity: {e}')
+    return failed
+
+
+def lock_memory():
+    """
+    Lock the current and future pages of the process in RAM
+
+    return: None if locked, the reason otherwise
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+            return f'mlockall: {os.strerror(ctypes.get_errno())}'
+    except (AttributeError, OSError) as e:
+        return f'mlockall: {e}'
+    return None
+
+
+class JitterStats():
+    """
+    Period jitter of a periodic loop, |period - nominal| in seconds
+    """
+
+    SIZE = 1000     # periods kept for the percentiles
+
+    def __init__(self, period, size=SIZE):
+        """
+            JitterStats init
+            period: nominal period, s
+            size: number of recent periods the percentiles are taken over
+        """
+        self.lock = threading.Lock()
+        self.period = period
+        self.samples = deque(maxlen=size)
+        self.max = 0.0
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.max = 0.0
+
+    def update(self, period):
+        jitter = abs(period - self.period)
+        with self.lock:
+            self.samples.append(jitter)
+            self.max = max(self.max, jitter)
+
+    def as_dict(self):
+        """
+        :return: {'p50', 'p99': percentiles of the recent periods, 'max': since reset}
+        :rtype: dict
+        """
+        with self.lock:
+            samples = list(self.samples)
+            jitter_max = self.max
+        if not samples:
+            return {'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        p50, p99 = np.percentile(samples, [50, 99])
+        return {'p50': float(p50), 'p99': float(p99), 'max': jitter_max}
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Servo output with write deduplication
+
+Holding a pose repeats the same frame many times and the action threads
+rewrite every channel of a group even when only one moved. ServoOutput is a
+Robot that remembers the last PWM value written to each channel and skips the
+I2C write when the new value is within DEADBAND counts of it. One count is
+20 ms / PERIOD ~ 4.9 us, about 0.44 degree, so the default deadband of 0 only
+skips writes that would not change the pulse at all.
+"""
+
+from robot_hat import Robot
+
+
+class ServoOutput(Robot):
+
+    DEADBAND = 0    # PWM counts
+
+    def __init__(self, *args, deadband=DEADBAND, **kwargs):
+        """
+            ServoOutput init, same arguments as Robot
+            deadband: PWM counts a channel may change without being written
+        """
+        # set before Robot.__init__, which may already write the servos
+        self.deadband = deadband
+        self.last_values = {}   # channel index -> last written PWM value
+        self.writes = 0
+        self.saved = 0
+        super().__init__(*args, **kwargs)
+
+    def angle2value(self, index, angle):
+        # same mapping as Servo.angle and Servo.pulse_width_time
+        servo = self.servo_list[index]
+        angle = min(max(angle, -90), 90)
+        pulse_width_time = servo.MIN_PW + (angle + 90) * (servo.MAX_PW - servo.MIN_PW) / 180
+        return int(pulse_width_time / 20000.0 * servo.PERIOD)
+
+    def servo_write_raw(self, angle_list):
+        for i in range(self.pin_num):
+            value = self.angle2value(i, angle_list[i])
+            last = self.last_values.get(i)
+            if last is not None and abs(value - last) <= self.deadband:
+                self.saved += 1
+                continue
+            self.servo_list[i].angle(float(angle_list[i]))
+            self.last_values[i] = value
+            self.writes += 1
+
+    def write_stats(self):
+        """
+        :return: {'writes': channel writes done, 'saved': channel writes skipped}
+        :rtype: dict
+        """
+        return {'writes': self.writes, 'saved': self.saved}
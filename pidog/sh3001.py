@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 import time
 from robot_hat import I2C, fileDB
+try:
+    from smbus2 import i2c_msg
+except ImportError:
+    i2c_msg = None
 
 # from filedb import fileDB
 
@@ -350,6 +354,10 @@ class Sh3001(I2C):
     SH3001_FIFO_ACC_Y_EN = 0x0002
     SH3001_FIFO_ACC_X_EN = 0x0001
     SH3001_FIFO_ALL_DIS = 0x0000
+
+    SH3001_FIFO_SIZE = 1024         # bytes
+    SH3001_FIFO_RESET = 0x80        # FIFO_CONF0
+    SH3001_FIFO_BLOCK_SIZE = 24     # bytes per SMBus block read, whole acc + gyro samples
     '''
     /******************************************************************
     *	AUX I2C Config Macro Definitions
@@ -401,6 +409,7 @@ class Sh3001(I2C):
 
         self.gyro_offset = [0, 0, 0]
         self.data_vector = [0, 0, 0]
+        self.fifo_frame_size = 12   # bytes per FIFO sample, see fifo_config
 
     def get_from_config(self, name, default_value=None):
         value = self.db.get(name, default_value)
@@ -565,6 +574,260 @@ class Sh3001(I2C):
             # print("_sh3001_getimudata error: ", e)
             return False
 
+    # region: FIFO
+    def fifo_config(self, mode=SH3001_FIFO_MODE_STREAM, watermark=SH3001_FIFO_SIZE // 2,
+                    channels=SH3001_FIFO_ACC_X_EN | SH3001_FIFO_ACC_Y_EN | SH3001_FIFO_ACC_Z_EN
+                    | SH3001_FIFO_GYRO_X_EN | SH3001_FIFO_GYRO_Y_EN | SH3001_FIFO_GYRO_Z_EN):
+        '''
+        Configure and reset the FIFO, samples are stored at the ODR (no down sampling)
+
+        mode: SH3001_FIFO_MODE_STREAM keeps the newest samples when full,
+              SH3001_FIFO_MODE_FIFO stops, SH3001_FIFO_MODE_DIS disables
+        watermark: bytes, level of the FIFO watermark interrupt
+        channels: SH3001_FIFO_*_EN flags, fifo_read expects acc and gyro xyz
+        '''
+        watermark = min(watermark, self.SH3001_FIFO_SIZE)
+        # no down sampling, acc and gyro at the ODR
+        self.mem_write(self.SH3001_FIFO_ACC_DOWNS_DIS | self.SH3001_FIFO_GYRO_DOWNS_DIS,
+                       self.SH3001_FIFO_CONF4)
+        self.mem_write(watermark & 0xFF, self.SH3001_FIFO_CONF1)
+        self.mem_write(((watermark >> 8) & 0x07) | ((channels >> 8) & 0x30), self.SH3001_FIFO_CONF2)
+        self.mem_write(channels & 0xFF, self.SH3001_FIFO_CONF3)
+        self.fifo_reset(mode)
+        # 2 bytes per enabled channel
+        self.fifo_frame_size = 2 * bin(channels).count('1')
+
+    def fifo_reset(self, mode=SH3001_FIFO_MODE_STREAM):
+        regData = self.mem_read(1, self.SH3001_FIFO_CONF0)
+        regData[0] |= self.SH3001_FIFO_RESET
+        self.mem_write(regData, self.SH3001_FIFO_CONF0)
+        regData[0] &= ~self.SH3001_FIFO_RESET & 0xFF
+        regData[0] = (regData[0] & 0xFC) | mode
+        self.mem_write(regData, self.SH3001_FIFO_CONF0)
+
+    def fifo_disable(self):
+        self.fifo_reset(self.SH3001_FIFO_MODE_DIS)
+
+    def fifo_count(self):
+        '''
+        Bytes waiting in the FIFO
+        '''
+        regData = self.mem_read(2, self.SH3001_FIFO_STA0)
+        return ((regData[1] & 0x07) << 8) | regData[0]
+
+    def _fifo_read_bytes(self, length):
+        # one combined I2C transaction when smbus2 is available, else SMBus block reads
+        bus = getattr(self, '_smbus', None)
+        if i2c_msg is not None and hasattr(bus, 'i2c_rdwr'):
+            write = i2c_msg.write(self.address, [self.SH3001_FIFO_DATA])
+            read = i2c_msg.read(self.address, length)
+            bus.i2c_rdwr(write, read)
+            return list(read)
+        data = []
+        while len(data) < length:
+            data += self.mem_read(min(self.SH3001_FIFO_BLOCK_SIZE, length - len(data)),
+                                  self.SH3001_FIFO_DATA)
+        return data
+
+    def fifo_read(self, max_samples=None):
+        '''
+        Drain the FIFO, only whole samples are read
+
+        max_samples: samples to read at most, None for all
+        return: list of (accData, gyroData), oldest first, False on error
+        '''
+        try:
+            frame_size = self.fifo_frame_size
+            count = self.fifo_count() // frame_size
+            if max_samples is not None:
+                count = min(count, max_samples)
+            if count == 0:
+                return []
+            regData = self._fifo_read_bytes(count * frame_size)
+            samples = []
+            for i in range(0, count * frame_size, frame_size):
+                values = [bytes_toint(regData[i + j + 1], regData[i + j]) for j in range(0, 12, 2)]
+                samples.append((values[:3], values[3:]))
+            return samples
+        except Exception as e:
+            print("fifo_read error: ", e)
+            return False
+
+    # endregion: FIFO
+
+    # region: interrupt
+    def int_config(self, level=SH3001_INT_LEVEL_HIGH, latch=SH3001_INT_NO_LATCH,
+                   clear=SH3001_INT_CLEAR_STATUS, mode=SH3001_INT_INT_NORMAL):
+        '''
+        Electrical behaviour of the INT pins
+
+        level: SH3001_INT_LEVEL_HIGH (active high) or SH3001_INT_LEVEL_LOW
+        latch: SH3001_INT_NO_LATCH (pulse) or SH3001_INT_LATCH (until the status is read)
+        clear: SH3001_INT_CLEAR_STATUS (reading the status) or SH3001_INT_CLEAR_ANY (any read)
+        mode: SH3001_INT_INT_NORMAL (push-pull) or SH3001_INT_INT_OD (open drain), both pins
+        '''
+        regData = self.mem_read(1, self.SH3001_INT_CONF)
+        # the *_LOW, NO_LATCH and CLEAR_ANY values are bits to set, the others
+        # are masks clearing them
+        for value, bit in ((level, self.SH3001_INT_LEVEL_LOW),
+                           (latch, self.SH3001_INT_NO_LATCH),
+                           (clear, self.SH3001_INT_CLEAR_ANY)):
+            if value & bit:
+                regData[0] |= bit
+            else:
+                regData[0] &= ~bit & 0xFF
+        # the OD masks share bits with NORMAL (0xFE & 0x05), compare the values
+        if mode in (self.SH3001_INT_INT_NORMAL, self.SH3001_INT_INT1_NORMAL):
+            regData[0] |= self.SH3001_INT_INT_NORMAL | self.SH3001_INT_INT1_NORMAL
+        else:
+            regData[0] &= self.SH3001_INT_INT_OD & self.SH3001_INT_INT1_OD
+        self.mem_write(regData, self.SH3001_INT_CONF)
+
+    def int_enable(self, int_type, enable=SH3001_INT_ENABLE, pin=SH3001_INT_MAP_INT):
+        '''
+        Enable or disable interrupt sources
+
+        int_type: SH3001_INT_* source flags, or-ed
+        enable: SH3001_INT_ENABLE or SH3001_INT_DISABLE
+        pin: SH3001_INT_MAP_INT or SH3001_INT_MAP_INT1, the pin the sources drive
+        '''
+        for register, pin_map in ((self.SH3001_INT_ENABLE0, False), (self.SH3001_INT_PIN_MAP0, True)):
+            # two registers, high byte first
+            regData = self.mem_read(2, register)
+            on = pin == self.SH3001_INT_MAP_INT1 if pin_map else enable == self.SH3001_INT_ENABLE
+            for i, bits in enumerate(((int_type >> 8) & 0xFF, int_type & 0xFF)):
+                if on:
+                    regData[i] |= bits
+                else:
+                    regData[i] &= ~bits & 0xFF
+            self.mem_write(regData, register)
+
+    def int_status(self):
+        '''
+        Interrupt status, reading it clears the latched interrupts
+
+        return: SH3001_INT_* flags of the pending sources
+        '''
+        regData = self.mem_read(2, self.SH3001_INT_STA0)
+        return (regData[0] << 8) | regData[1]
+
+    def _write16(self, value, register):
+        # 16 bit value, low byte first
+        self.mem_write([value & 0xFF, (value >> 8) & 0xFF], register)
+
+    # motion detectors, thresholds and times are register values, see the SH3001 datasheet
+    def tap_config(self, axes=SH3001_TAP_X_INT_EN | SH3001_TAP_Y_INT_EN | SH3001_TAP_Z_INT_EN,
+                   threshold=0x40, duration=0x08, latency=0x04, window=0x30):
+        '''
+        Tap and double tap detector
+
+        axes: SH3001_TAP_*_INT_EN flags
+        window: double tap window
+        '''
+        regData = self.mem_read(1, self.SH3001_HIGHLOW_G_INT_CONF)
+        regData[0] = (regData[0] & 0xF1) | axes
+        self.mem_write(regData, self.SH3001_HIGHLOW_G_INT_CONF)
+        self.mem_write(threshold, self.SH3001_TAP_INT_THRESHOLD)
+        self.mem_write(duration, self.SH3001_TAP_INT_DURATION)
+        self.mem_write(latency, self.SH3001_TAP_INT_LATENCY)
+        self.mem_write(window, self.SH3001_DTAP_INT_WINDOW)
+
+    def act_config(self, axes=SH3001_ACT_X_INT_EN | SH3001_ACT_Y_INT_EN | SH3001_ACT_Z_INT_EN,
+                   mode=SH3001_ACT_AC_MODE, threshold=0x20, time=0x02):
+        '''
+        Activity detector: acceleration change above threshold for time
+
+        axes: SH3001_ACT_*_INT_EN flags
+        mode: SH3001_ACT_AC_MODE (change) or SH3001_ACT_DC_MODE (absolute)
+        '''
+        regData = self.mem_read(1, self.SH3001_ACT_INACT_INT_CONF)
+        regData[0] = (regData[0] & 0x0F) | mode | axes
+        self.mem_write(regData, self.SH3001_ACT_INACT_INT_CONF)
+        self.mem_write(threshold, self.SH3001_ACT_INT_THRESHOLD)
+        self.mem_write(time, self.SH3001_ACT_INT_TIME)
+
+    def inact_config(self, axes=SH3001_INACT_X_INT_EN | SH3001_INACT_Y_INT_EN | SH3001_INACT_Z_INT_EN,
+                     mode=SH3001_INACT_AC_MODE, threshold=0x000400, time=0x10, g1=16384,
+                     link=SH3001_LINK_PRE_STA_NO):
+        '''
+        Inactivity detector: acceleration change below threshold for time
+
+        axes: SH3001_INACT_*_INT_EN flags
+        mode: SH3001_INACT_AC_MODE or SH3001_INACT_DC_MODE
+        threshold: 24 bits
+        g1: 1 g reference, 16384 at the 2 g range
+        link: SH3001_LINK_PRE_STA to report inactivity only after activity
+        '''
+        regData = self.mem_read(1, self.SH3001_ACT_INACT_INT_CONF)
+        regData[0] = (regData[0] & 0xF0) | mode | axes
+        self.mem_write(regData, self.SH3001_ACT_INACT_INT_CONF)
+        self.mem_write(threshold & 0xFF, self.SH3001_INACT_INT_THRESHOLDL)
+        self.mem_write((threshold >> 8) & 0xFF, self.SH3001_INACT_INT_THRESHOLDM)
+        self.mem_write((threshold >> 16) & 0xFF, self.SH3001_INACT_INT_THRESHOLDH)
+        self.mem_write(time, self.SH3001_INACT_INT_TIME)
+        self._write16(g1, self.SH3001_INACT_INT_1G_REFL)
+        self.mem_write(link, self.SH3001_ACT_INACT_INT_LINK)
+
+    def highg_config(self, axes=SH3001_HIGHG_ALL_INT_EN | SH3001_HIGHG_X_INT_EN
+                     | SH3001_HIGHG_Y_INT_EN | SH3001_HIGHG_Z_INT_EN,
+                     threshold=0xC0, time=0x04):
+        '''
+        High g detector
+
+        axes: SH3001_HIGHG_*_INT_EN flags
+        '''
+        regData = self.mem_read(1, self.SH3001_HIGHLOW_G_INT_CONF)
+        regData[0] = (regData[0] & 0x0F) | axes
+        self.mem_write(regData, self.SH3001_HIGHLOW_G_INT_CONF)
+        self.mem_write(threshold, self.SH3001_HIGHG_INT_THRESHOLD)
+        self.mem_write(time, self.SH3001_HIGHG_INT_TIME)
+
+    def lowg_config(self, enable=SH3001_LOWG_ALL_INT_EN, threshold=0x20, time=0x04):
+        '''
+        Low g detector, all axes below threshold
+        '''
+        regData = self.mem_read(1, self.SH3001_HIGHLOW_G_INT_CONF)
+        regData[0] = (regData[0] & 0xFE) | enable
+        self.mem_write(regData, self.SH3001_HIGHLOW_G_INT_CONF)
+        self.mem_write(threshold, self.SH3001_LOWG_INT_THRESHOLD)
+        self.mem_write(time, self.SH3001_LOWG_INT_TIME)
+
+    def freefall_config(self, threshold=0x10, time=0x08):
+        '''
+        Free fall detector, acceleration norm below threshold for time
+        '''
+        self.mem_write(threshold, self.SH3001_FREEFALL_INT_THRES)
+        self.mem_write(time, self.SH3001_FREEFALL_INT_TIME)
+
+    def flat_config(self, time=SH3001_FLAT_TIME_500MS, tan_theta2=0x10):
+        '''
+        Flat detector
+
+        time: SH3001_FLAT_TIME_* the position must be held
+        tan_theta2: tan(max tilt)^2, 6 bits
+        '''
+        self.mem_write((time & 0xC0) | (tan_theta2 & 0x3F), self.SH3001_FLAT_INT_CONF)
+
+    def orient_config(self, block=SH3001_ORIENT_BLOCK_MODE1, mode=SH3001_ORIENT_SYMM, theta=0x10,
+                      g1point5=0x6000, slope=0x0CCC, hyst=0x0333):
+        '''
+        Orientation (portrait / landscape, up / down) detector
+
+        block: SH3001_ORIENT_BLOCK_MODE*
+        mode: SH3001_ORIENT_SYMM, SH3001_ORIENT_HIGH_ASYMM or SH3001_ORIENT_LOW_ASYMM
+        g1point5: 1.5 g, 16 bits
+        slope, hyst: 16 bits, in acceleration units
+        '''
+        regData = self.mem_read(1, self.SH3001_ORIEN_INTCONF0)
+        regData[0] = (regData[0] & 0xF0) | block | mode
+        self.mem_write(regData, self.SH3001_ORIEN_INTCONF0)
+        self.mem_write(theta, self.SH3001_ORIEN_INTCONF1)
+        self._write16(g1point5, self.SH3001_ORIEN_INT_LOW)
+        self._write16(slope, self.SH3001_ORIEN_INT_SLOPE_LOW)
+        self._write16(hyst, self.SH3001_ORIEN_INT_HYST_LOW)
+
+    # endregion: interrupt
+
     def sh3001_getimudata(self, aram, axis):
         accData, gyroData = self._sh3001_getimudata()
         accData = [(accData[i] - self.acc_offset[i])
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Time-parameterized trajectories
+
+A Trajectory treats a few keyframes as control points with timestamps and
+interpolates them at any rate, so smooth motion no longer depends on how
+many frames were baked into an action:
+
+    cubic:    cubic Hermite spline through the keyframes, tangents from the
+              neighbouring keyframes (Catmull-Rom), starts and ends at rest
+    min_jerk: minimum jerk profile between consecutive keyframes, stops at
+              every keyframe with zero velocity and acceleration
+
+Sampled frames are TimedFrame, a list of angles carrying its duration, which
+the motion scheduler and the action threads play in exactly that time
+instead of deriving it from the speed.
+"""
+
+import numpy as np
+
+
+class TimedFrame(list):
+    """
+    Frame of servo angles to reach in duration seconds
+    """
+
+    def __init__(self, angles, duration):
+        super().__init__(angles)
+        self.duration = duration
+
+
+class Trajectory():
+
+    CUBIC = 'cubic'
+    MIN_JERK = 'min_jerk'
+
+    def __init__(self, keyframes, times, method=CUBIC):
+        """
+            Trajectory init
+            keyframes: N frames of servo angles
+            times: N increasing timestamps of the keyframes, seconds
+            method: CUBIC or MIN_JERK
+        """
+        if method not in (self.CUBIC, self.MIN_JERK):
+            raise ValueError("method must be 'cubic' or 'min_jerk'")
+        self.keyframes = np.asarray(keyframes, dtype=float)
+        self.times = np.asarray(times, dtype=float)
+        if self.keyframes.ndim != 2 or len(self.keyframes) != len(self.times):
+            raise ValueError('keyframes and times must have the same length')
+        if np.any(np.diff(self.times) <= 0):
+            raise ValueError('times must be increasing')
+        self.method = method
+        self.tangents = self._tangents()
+
+    @property
+    def duration(self):
+        return self.times[-1] - self.times[0]
+
+    def _tangents(self):
+        p = self.keyframes
+        t = self.times
+        m = np.zeros_like(p)
+        if len(p) > 2:
+            m[1:-1] = (p[2:] - p[:-2]) / (t[2:] - t[:-2])[:, None]
+        return m
+
+    def sample(self, t):
+        """
+        Angles at time t
+
+        t: seconds, scalar or array of shape (M,)
+        return: (width,) or (M, width) array
+        """
+        t = np.clip(np.asarray(t, dtype=float), self.times[0], self.times[-1])
+        p = self.keyframes
+        if len(p) == 1:
+            return np.broadcast_to(p[0], t.shape + p.shape[1:]).copy()
+        i = np.clip(np.searchsorted(self.times, t, side='right') - 1, 0, len(p) - 2)
+        h = (self.times[i + 1] - self.times[i])[..., None]
+        s = ((t - self.times[i])[..., None]) / h
+        if self.method == self.MIN_JERK:
+            return p[i] + (p[i + 1] - p[i]) * (10 * s**3 - 15 * s**4 + 6 * s**5)
+        h00 = 2 * s**3 - 3 * s**2 + 1
+        h10 = s**3 - 2 * s**2 + s
+        h01 = -2 * s**3 + 3 * s**2
+        h11 = s**3 - s**2
+        m = self.tangents
+        return h00 * p[i] + h10 * h * m[i] + h01 * p[i + 1] + h11 * h * m[i + 1]
+
+    def frames(self, rate):
+        """
+        Sample the whole trajectory
+
+        rate: frames per second
+        return: list of TimedFrame, the first one is the first keyframe
+        """
+        count = max(1, int(round(self.duration * rate)))
+        ts = self.times[0] + np.arange(count + 1) * (self.duration / count)
+        period = self.duration / count
+        return [TimedFrame(angles, period) for angles in self.sample(ts).tolist()]
+
+
+def retime(frames, max_dps, max_dpss, start=None, min_duration=0.01, hold_duration=None):
+    """
+    Fastest timing of a frame sequence within velocity and acceleration limits
+
+    Every frame is reached linearly from the previous one, like servo_move,
+    so the servos move at a constant velocity d / T during a frame of
+    duration T. The durations are the smallest that keep, for every servo,
+
+        |d_i| / T_i <= max_dps
+        |v_i - v_i-1| <= max_dpss * (T_i-1 + T_i) / 2
+
+    starting and ending at rest (the first and last frames accelerate over
+    their own duration). Forward and backward passes only lengthen
+    frames, they are repeated until no frame changes. Frames that do not
+    move are holds (pauses of the preset actions), they last at least
+    hold_duration instead of collapsing to min_duration.
+
+    frames: N frames of servo angles
+    max_dps: velocity limit, degree/s, a number or one per servo
+    max_dpss: acceleration limit, degree/s^2, a number or one per servo
+    start: angles before the first frame, the first frame if None
+    min_duration: shortest frame, s
+    hold_duration: shortest frame that does not move, s, min_duration if None
+    return: (list of TimedFrame, total duration in s)
+    """
+    p = np.asarray(frames, dtype=float)
+    if len(p) == 0:
+        return [], 0.0
+    if start is None:
+        start = p[0]
+    d = np.abs(np.diff(np.vstack([start, p]), axis=0))
+    vmax = np.broadcast_to(np.asarray(max_dps, dtype=float), d.shape[1:])
+    amax = np.broadcast_to(np.asarray(max_dpss, dtype=float), d.shape[1:])
+    signed = np.diff(np.vstack([start, p]), axis=0)
+
+    n = len(p)
+    durations = np.maximum(np.max(d / vmax, axis=1), min_duration)
+    if hold_duration is not None:
+        still = np.all(d == 0, axis=1)
+        durations[still] = np.maximum(durations[still], hold_duration)
+
+    def feasible(i, t, j, tj):
+        # acceleration between frame i (duration t) and frame j (duration tj), j may be rest
+        v = signed[i] / t
+        vj = 0 if j is None else signed[j] / tj
+        span = t if j is None else (t + tj) / 2
+        return np.all(np.abs(v - vj) <= amax * span + 1e-9)
+
+    def lengthen(i, j):
+        tj = None if j is None else durations[j]
+        t = durations[i]
+        if feasible(i, t, j, tj):
+            return False
+        lo = t
+        hi = t * 1.5
+        while not feasible(i, hi, j, tj):
+            lo = hi
+            hi *= 1.5
+        for _ in range(20):
+            mid = (lo + hi) / 2
+            if feasible(i, mid, j, tj):
+                hi = mid
+            else:
+                lo = mid
+        durations[i] = hi
+        return True
+
+    for _ in range(100):
+        changed = False
+        for i in range(n):
+            changed |= lengthen(i, i - 1 if i > 0 else None)
+        for i in range(n - 1, -1, -1):
+            changed |= lengthen(i, i + 1 if i < n - 1 else None)
+        if not changed:
+            break
+
+    timed = [TimedFrame(angles, float(t)) for angles, t in zip(p.tolist(), durations)]
+    return timed, float(np.sum(durations))
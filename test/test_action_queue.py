@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# python3 -m unittest discover -s test -p 'test_*.py'
+import threading
+import unittest
+from time import sleep
+from pidog.action_queue import ActionQueue, MotionGroup
+
+
+def later(fn, delay=0.05):
+    thread = threading.Thread(target=lambda: (sleep(delay), fn()))
+    thread.start()
+    return thread
+
+
+class TestActionQueue(unittest.TestCase):
+
+    def test_fifo_wraparound(self):
+        queue = ActionQueue(capacity=4)
+        expected = []
+        for i in range(10):
+            queue.append([i])
+            expected.append([i])
+            if len(queue) == 3:
+                self.assertEqual(queue.pop(), expected.pop(0))
+        self.assertEqual(list(queue), expected)
+        self.assertEqual(queue[0], expected[0])
+        self.assertEqual(queue[-1], expected[-1])
+        with self.assertRaises(IndexError):
+            queue[len(expected)]
+
+    def test_append_blocks_when_full(self):
+        queue = ActionQueue(capacity=2)
+        queue.extend([[0], [1]])
+        done = threading.Event()
+        thread = threading.Thread(target=lambda: (queue.append([2]), done.set()))
+        thread.start()
+        self.assertFalse(done.wait(0.05))
+        self.assertEqual(queue.pop(), [0])
+        self.assertTrue(done.wait(1))
+        thread.join()
+        self.assertEqual(list(queue), [[1], [2]])
+
+    def test_get_waits_for_a_frame(self):
+        queue = ActionQueue()
+        self.assertIsNone(queue.get(timeout=0.01))
+        thread = later(lambda: queue.append([1]))
+        self.assertEqual(queue.get(timeout=1), [1])
+        thread.join()
+        self.assertEqual(len(queue), 0)
+
+    def test_begin_task_done(self):
+        queue = ActionQueue()
+        queue.extend([[0], [1]])
+        self.assertEqual(queue.begin(), [0])
+        # the frame being written stays queued until task_done
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.inflight, 0)
+        queue.task_done()
+        self.assertIsNone(queue.inflight)
+        self.assertEqual(list(queue), [[1]])
+        self.assertEqual(queue.begin(), [1])
+        queue.task_done()
+        self.assertEqual(len(queue), 0)
+
+    def test_clear_while_in_flight(self):
+        queue = ActionQueue()
+        queue.extend([[0], [1], [2]])
+        self.assertEqual(queue.begin(), [0])
+        queue.clear()
+        self.assertEqual(len(queue), 0)
+        # task_done of the dropped frame must not remove a newer one
+        queue.append([3])
+        queue.task_done()
+        self.assertEqual(list(queue), [[3]])
+
+    def test_truncate_keeps_oldest(self):
+        queue = ActionQueue()
+        queue.extend([[0], [1], [2]])
+        queue.truncate(1)
+        self.assertEqual(list(queue), [[0]])
+
+    def test_close_wakes_waiters(self):
+        queue = ActionQueue(capacity=1)
+        results = []
+        getter = threading.Thread(target=lambda: results.append(queue.get()))
+        getter.start()
+        sleep(0.02)
+        queue.close()
+        getter.join(1)
+        self.assertFalse(getter.is_alive())
+        self.assertEqual(results, [None])
+        self.assertIsNone(queue.peek())
+
+        queue.open()
+        queue.append([0])
+        appender = threading.Thread(target=lambda: queue.append([1]))
+        appender.start()
+        sleep(0.02)
+        queue.close()
+        appender.join(1)
+        self.assertFalse(appender.is_alive())
+        # dropped, the full ring is not overwritten
+        self.assertEqual(list(queue), [[0]])
+        queue.pop()
+        queue.open()
+        queue.append([1])
+        self.assertEqual(queue.peek(), [1])
+
+
+def write(queue, count=1):
+    # what the action thread does for count frames
+    for _ in range(count):
+        queue.begin()
+        queue.task_done()
+
+
+class TestMotionHandle(unittest.TestCase):
+
+    def test_done_after_written(self):
+        queue = ActionQueue()
+        queue.extend([[0], [1]])
+        handle = queue.handle()
+        self.assertFalse(handle.done())
+        write(queue)
+        self.assertFalse(handle.done())
+        queue.begin()
+        # still being written
+        self.assertFalse(handle.done())
+        queue.task_done()
+        self.assertTrue(handle.done())
+        self.assertTrue(handle.wait(0))
+
+    def test_wait_timeout(self):
+        queue = ActionQueue()
+        queue.append([0])
+        handle = queue.handle()
+        self.assertFalse(handle.wait(0.02))
+        thread = later(lambda: write(queue))
+        self.assertTrue(handle.wait(1))
+        thread.join()
+
+    def test_callback_when_already_done(self):
+        queue = ActionQueue()
+        queue.append([0])
+        handle = queue.handle()
+        write(queue)
+        called = []
+        handle.add_done_callback(called.append)
+        self.assertEqual(called, [handle])
+
+    def test_callback_when_written(self):
+        queue = ActionQueue()
+        queue.extend([[0], [1]])
+        handle = queue.handle()
+        called = []
+        handle.add_done_callback(called.append)
+        write(queue)
+        self.assertEqual(called, [])
+        write(queue)
+        self.assertEqual(called, [handle])
+
+    def test_cleared_frames_are_done(self):
+        queue = ActionQueue()
+        queue.extend([[0], [1], [2]])
+        handle = queue.handle()
+        called = []
+        handle.add_done_callback(called.append)
+        queue.clear()
+        self.assertTrue(handle.done())
+        self.assertTrue(handle.wait(0))
+        self.assertEqual(called, [handle])
+
+    def test_cleared_while_in_flight(self):
+        queue = ActionQueue()
+        queue.append([0])
+        first = queue.handle()
+        queue.append([1])
+        second = queue.handle()
+        queue.begin()
+        queue.clear()
+        # frame 0 is still being written, frame 1 is dropped
+        self.assertFalse(first.done())
+        self.assertFalse(second.done())
+        queue.task_done()
+        self.assertTrue(first.done())
+        self.assertTrue(second.done())
+
+
+class TestMotionGroup(unittest.TestCase):
+
+    def test_wait_all(self):
+        legs = ActionQueue()
+        head = ActionQueue()
+        legs.append([0])
+        head.append([0])
+        group = MotionGroup([legs.handle(), head.handle(), None])
+        self.assertEqual(len(group.handles), 2)
+        called = []
+        group.add_done_callback(called.append)
+        write(legs)
+        self.assertFalse(group.done())
+        self.assertFalse(group.wait(0.02))
+        self.assertEqual(called, [])
+        write(head)
+        self.assertTrue(group.done())
+        self.assertTrue(group.wait(0))
+        self.assertEqual(called, [group])
+
+    def test_empty(self):
+        group = MotionGroup([None])
+        called = []
+        group.add_done_callback(called.append)
+        self.assertTrue(group.done())
+        self.assertTrue(group.wait(0))
+        self.assertEqual(called, [group])
+
+
+class TestSetTarget(unittest.TestCase):
+
+    def test_replaces_pending(self):
+        queue = ActionQueue()
+        queue.extend([[0], [1]])
+        handle = queue.set_target([2])
+        self.assertEqual(list(queue), [[2]])
+        self.assertFalse(queue.preempted)
+        queue.set_target([3])
+        self.assertEqual(list(queue), [[3]])
+        self.assertTrue(handle.done())
+        self.assertFalse(queue.handle().done())
+
+    def test_keeps_in_flight_frame(self):
+        queue = ActionQueue()
+        queue.extend([[0], [1]])
+        queue.begin()
+        first = queue.set_target([2])
+        self.assertEqual(list(queue), [[0], [2]])
+        self.assertEqual(queue.inflight, 0)
+        second = queue.set_target([3])
+        # the second target replaces the pending one, the frame being written stays
+        self.assertEqual(list(queue), [[0], [3]])
+        self.assertTrue(queue.take_preempted())
+        self.assertFalse(queue.take_preempted())
+        self.assertFalse(first.done())
+        queue.task_done()
+        self.assertTrue(first.done())
+        self.assertFalse(second.done())
+        self.assertEqual(queue.begin(), [3])
+        self.assertFalse(queue.preempted)
+        queue.task_done()
+        self.assertTrue(second.done())
+
+    def test_never_blocks(self):
+        queue = ActionQueue(capacity=2)
+        queue.extend([[0], [1]])
+        queue.begin()
+        queue.set_target([2])
+        queue.set_target([3])
+        self.assertEqual(list(queue), [[0], [3]])
+
+
+class TestPidogTargets(unittest.TestCase):
+
+    def setUp(self):
+        from pidog.pidog import Pidog
+        # only the buffers are needed, no hardware
+        self.dog = Pidog.__new__(Pidog)
+        self.dog.head_action_buffer = ActionQueue()
+        self.dog.tail_action_buffer = ActionQueue()
+
+    def test_set_head_target(self):
+        dog = self.dog
+        dog.head_action_buffer.extend([[0, 0, 0], [1, 1, 1]])
+        dog.head_action_buffer.begin()
+        dog.set_head_target([10, 0, 0], speed=80)
+        dog.set_head_target([20, 0, 0])
+        self.assertEqual(list(dog.head_action_buffer), [[0, 0, 0], dog.head_rpy_to_angle([20, 0, 0])])
+        self.assertTrue(dog.head_action_buffer.preempted)
+        self.assertEqual(dog.head_speed, 100)
+
+    def test_set_tail_target(self):
+        dog = self.dog
+        dog.tail_action_buffer.extend([[0], [5]])
+        handle = dog.set_tail_target((30,))
+        self.assertEqual(list(dog.tail_action_buffer), [[30]])
+        self.assertFalse(dog.tail_action_buffer.preempted)
+        write(dog.tail_action_buffer)
+        self.assertTrue(handle.done())
+
+
+if __name__ == '__main__':
+    unittest.main()
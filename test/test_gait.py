@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# python3 -m unittest discover -s test -p 'test_*.py'
+import unittest
+from pidog.gait import GaitGenerator
+
+
+def lift_order(gait, cycles=2):
+    # legs (1 ~ 4) in the order their feet leave the ground
+    generator = GaitGenerator(gait, velocity=60, step_height=20, cadence=0.6)
+    frame_count = int(cycles * generator.frame_rate / generator.cadence)
+    lifted = [False] * 4
+    order = []
+    for _ in range(frame_count):
+        coords = generator.next_frame()
+        for i, (y, z) in enumerate(coords):
+            up = z < GaitGenerator.Z_ORIGIN - 1e-6
+            if up and not lifted[i]:
+                order.append(i + 1)
+            lifted[i] = up
+    return order
+
+
+class TestGaitGenerator(unittest.TestCase):
+
+    def test_frame_shape(self):
+        generator = GaitGenerator(velocity=60)
+        coords = generator.next_frame()
+        self.assertEqual(len(coords), 4)
+        self.assertTrue(all(len(c) == 2 for c in coords))
+
+    def test_walk_lift_order(self):
+        # 1, 4, 2, 3 like Walk.LEG_ORDER, one leg at a time
+        order = lift_order(GaitGenerator.WALK)
+        start = order.index(1)
+        self.assertEqual(order[start:start + 4], [1, 4, 2, 3])
+
+    def test_trot_diagonal_pairs(self):
+        generator = GaitGenerator(GaitGenerator.TROT, velocity=60, step_height=20, cadence=0.6)
+        for _ in range(100):
+            coords = generator.next_frame()
+            self.assertAlmostEqual(coords[0][1], coords[3][1])
+            self.assertAlmostEqual(coords[1][1], coords[2][1])
+
+    def test_standing_still(self):
+        generator = GaitGenerator(velocity=0, step_height=20)
+        for _ in range(60):
+            self.assertTrue(all(z == GaitGenerator.Z_ORIGIN for y, z in generator.next_frame()))
+
+
+if __name__ == '__main__':
+    unittest.main()
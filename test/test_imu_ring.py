@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# python3 -m unittest discover -s test -p 'test_*.py'
+import unittest
+from pidog.imu_ring import ImuRing, batch_timestamps
+
+ODR = 500
+PERIOD = 1 / ODR
+
+
+class TestBatchTimestamps(unittest.TestCase):
+
+    def test_period_apart(self):
+        timestamps = batch_timestamps(5, 10.0, 9.9, PERIOD)
+        self.assertEqual(len(timestamps), 5)
+        self.assertAlmostEqual(timestamps[-1], 10.0)
+        for a, b in zip(timestamps, timestamps[1:]):
+            self.assertAlmostEqual(b - a, PERIOD)
+
+    def test_first_batch(self):
+        self.assertAlmostEqual(batch_timestamps(3, 1.0, None, PERIOD)[0], 1.0 - 2 * PERIOD)
+
+    def test_overlapping_batch(self):
+        # read 1 ms after a sample, 5 samples would reach back 8 ms
+        timestamps = batch_timestamps(5, 10.001, 10.0, PERIOD)
+        self.assertGreater(timestamps[0], 10.0)
+        self.assertAlmostEqual(timestamps[-1], 10.001)
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_empty(self):
+        self.assertEqual(batch_timestamps(0, 1.0, 0.5, PERIOD), [])
+
+
+class TestImuRing(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = ImuRing(capacity=16)
+
+    def tearDown(self):
+        self.ring.release()
+
+    def append_batches(self, batches):
+        # batches: (sample count, read time), like the IMU thread in FIFO mode
+        previous = None
+        for count, end in batches:
+            for t in batch_timestamps(count, end, previous, PERIOD):
+                self.ring.append(t, [0, 0, 0], [0, 0, 0], 0, 0, 0)
+                previous = t
+
+    def test_sorted_across_batches(self):
+        # uneven reads, some batches overlap the previous one
+        self.append_batches([(5, 1.000), (5, 1.003), (2, 1.004), (5, 1.020), (4, 1.021)])
+        timestamps = self.ring.window(self.ring.capacity)[:, ImuRing.TIMESTAMP]
+        self.assertTrue((timestamps[1:] >= timestamps[:-1]).all())
+
+    def test_since(self):
+        self.append_batches([(5, 1.000), (5, 1.003), (5, 1.020)])
+        window = self.ring.window(self.ring.capacity)
+        t = window[7, ImuRing.TIMESTAMP]
+        since = self.ring.since(t)
+        self.assertEqual(len(since), len(window) - 8)
+        self.assertTrue((since[:, ImuRing.TIMESTAMP] > t).all())
+
+    def test_window_wraps(self):
+        for i in range(40):
+            self.ring.append(float(i), [i, 0, 0], [0, 0, 0], 0, 0, 0)
+        window = self.ring.window(100)
+        self.assertEqual(len(window), self.ring.capacity - 1)
+        self.assertEqual(window[-1, ImuRing.TIMESTAMP], 39.0)
+        self.assertEqual(self.ring.latest()[ImuRing.AX], 39.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# python3 -m unittest discover -s test -p 'test_*.py'
+import unittest
+import numpy as np
+from pidog import kinematics
+from pidog.pidog import Pidog
+from pidog.gait import GaitGenerator
+from pidog.ik_table import IKTable
+
+
+def reachable_coords(count, seed=0):
+    # (count, 4, 2) leg coords inside the workspace of the legs
+    rng = np.random.default_rng(seed)
+    u = rng.uniform(abs(Pidog.FOOT - Pidog.LEG) + 1, Pidog.FOOT + Pidog.LEG - 1, (count, 4))
+    theta = rng.uniform(-np.pi / 3, np.pi / 3, (count, 4))
+    return np.stack([u * np.sin(theta), u * np.cos(theta)], axis=-1)
+
+
+class TestBatchIK(unittest.TestCase):
+
+    def assert_same_as_scalar(self, coords):
+        batch = Pidog.legs_angle_calculation_batch(coords)
+        scalar = [Pidog.legs_angle_calculation(frame) for frame in np.asarray(coords).tolist()]
+        np.testing.assert_allclose(batch, scalar, atol=1e-9)
+
+    def test_random_coords(self):
+        self.assert_same_as_scalar(reachable_coords(200))
+
+    def test_gait(self):
+        generator = GaitGenerator(velocity=80, step_height=20)
+        self.assert_same_as_scalar([generator.next_frame() for _ in range(100)])
+
+    def test_single_frame(self):
+        coords = reachable_coords(1)[0]
+        np.testing.assert_allclose(kinematics.legs_angle_calculation(coords),
+                                   Pidog.legs_angle_calculation(coords.tolist()), atol=1e-9)
+
+
+class TestIKTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.table = IKTable(Pidog.LEG, Pidog.FOOT)
+
+    def max_error(self, coords):
+        alpha, beta = self.table.coords2polar(coords)
+        e_alpha, e_beta = kinematics.coords2polar(coords, Pidog.LEG, Pidog.FOOT)
+        return max(np.max(np.abs(alpha - e_alpha)), np.max(np.abs(beta - e_beta)))
+
+    def test_error_bound(self):
+        # dense random points over the whole grid, also outside the workspace
+        rng = np.random.default_rng(1)
+        coords = np.stack([rng.uniform(*IKTable.Y_RANGE, 200000),
+                           rng.uniform(*IKTable.Z_RANGE, 200000)], axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.assertLessEqual(self.max_error(coords), IKTable.MAX_ERROR)
+
+    def test_workspace_edges(self):
+        # near full extension and folding, solved exactly
+        theta = np.linspace(-np.pi / 3, np.pi / 3, 50)
+        for u in (Pidog.FOOT + Pidog.LEG - 0.1, abs(Pidog.FOOT - Pidog.LEG) + 0.1):
+            coords = np.stack([u * np.sin(theta), u * np.cos(theta)], axis=-1)
+            self.assertLessEqual(self.max_error(coords), 1e-9)
+
+    def test_outside_grid(self):
+        self.assertLessEqual(self.max_error(np.array([[-130.0, 50.0], [20.0, -10.0]])), 1e-9)
+
+    def test_legs_angle_calculation(self):
+        coords = reachable_coords(100)
+        np.testing.assert_allclose(kinematics.legs_angle_calculation(coords, table=self.table),
+                                   kinematics.legs_angle_calculation(coords), atol=IKTable.MAX_ERROR)
+
+
+class TestForwardKinematics(unittest.TestCase):
+
+    def test_round_trip(self):
+        coords = reachable_coords(500)
+        angles = kinematics.legs_angle_calculation(coords)
+        np.testing.assert_allclose(kinematics.legs_coords_calculation(angles), coords, atol=1e-9)
+        np.testing.assert_allclose(Pidog.legs_coords_calculation_batch(angles), coords, atol=1e-9)
+
+    def test_single_frame(self):
+        coords = reachable_coords(1)[0]
+        angles = Pidog.legs_angle_calculation(coords.tolist())
+        np.testing.assert_allclose(kinematics.legs_coords_calculation(angles), coords, atol=1e-9)
+
+    def test_polar_round_trip(self):
+        rng = np.random.default_rng(2)
+        alpha = rng.uniform(-90, 90, (10, 4))
+        beta = rng.uniform(0, 180, (10, 4))
+        a, b = kinematics.angles2polar(kinematics.polar2angles(alpha, beta))
+        np.testing.assert_allclose(a, alpha, atol=1e-12)
+        np.testing.assert_allclose(b, beta, atol=1e-12)
+
+    def test_offsets(self):
+        coords = reachable_coords(10)
+        angles = kinematics.legs_angle_calculation(coords)
+        offsets = [1, -2, 3, 0, 0, 1, -1, 2]
+        shifted = kinematics.legs_coords_calculation(angles - offsets, offsets=offsets)
+        np.testing.assert_allclose(shifted, coords, atol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
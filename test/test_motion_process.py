@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# python3 -m unittest discover -s test -p 'test_*.py'
+import multiprocessing
+import unittest
+from pidog.pidog import Pidog
+from pidog.motion_process import MotionProcess, SharedActionQueue
+
+
+class FakeRobot():
+    # the child writes angles + offset to shared memory instead of the servos
+
+    def __init__(self, width):
+        self.offset = [0.0] * width
+        self.servo_positions = [0.0] * width
+        self.max_dps = 1e6
+        self.written = multiprocessing.get_context('fork').Array('d', width, lock=False)
+
+    def servo_write_all(self, angles):
+        for i in range(len(self.written)):
+            self.written[i] = angles[i] + self.offset[i]
+
+
+class TestMotionProcess(unittest.TestCase):
+
+    def setUp(self):
+        self.robots = {'legs': FakeRobot(8), 'head': FakeRobot(3), 'tail': FakeRobot(1)}
+        self.queues = {name: SharedActionQueue(len(robot.offset)) for name, robot in self.robots.items()}
+        self.process = MotionProcess(self.robots, self.queues, rate=200)
+        self.process.start()
+
+    def tearDown(self):
+        self.process.stop()
+        for queue in self.queues.values():
+            queue.release()
+
+    def test_wide_frame(self):
+        queue = self.queues['tail']
+        queue += [[5, 6, 7]]
+        self.assertEqual(list(queue), [[5]])
+        self.assertTrue(queue.handle().wait(5))
+        self.assertEqual(self.robots['tail'].written[:], [5])
+
+    def test_offsets_forwarded(self):
+        # set after the fork, the child robot is a copy
+        self.process.set_offset('head', [1, -2, 3])
+        queue = self.queues['head']
+        queue += [[10, 10, 10]]
+        self.assertTrue(queue.handle().wait(5))
+        self.assertEqual(self.robots['head'].written[:], [11, 8, 13])
+
+    def test_stop_and_lie(self):
+        # only the queues are needed, no hardware
+        dog = Pidog.__new__(Pidog)
+        dog.legs_action_buffer = self.queues['legs']
+        dog.head_action_buffer = self.queues['head']
+        dog.tail_action_buffer = self.queues['tail']
+        dog.legs_thread_lock = dog.legs_action_buffer.lock
+        dog.head_thread_lock = dog.head_action_buffer.lock
+        dog.tail_thread_lock = dog.tail_action_buffer.lock
+        dog.actions_dict = {'lie': [[[45, -45, -45, 45, 45, -45, -45, 45]]]}
+        dog.tail_move([[30]], speed=100)
+        dog.stop_and_lie(speed=100)
+        self.assertTrue(dog.is_all_done())
+        self.assertEqual(self.robots['legs'].written[:], [45, -45, -45, 45, 45, -45, -45, 45])
+        self.assertEqual(self.robots['tail'].written[:], [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
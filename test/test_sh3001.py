@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# python3 -m unittest discover -s test -p 'test_*.py'
+import unittest
+from pidog.sh3001 import Sh3001
+
+
+class FakeSh3001(Sh3001):
+    # registers in a dict instead of the I2C bus
+
+    def __init__(self, registers=None):
+        self.registers = dict(registers or {})
+
+    def mem_read(self, length, memaddr):
+        return [self.registers.get(memaddr + i, 0) for i in range(length)]
+
+    def mem_write(self, data, memaddr):
+        if isinstance(data, int):
+            data = [data]
+        for i, value in enumerate(data):
+            self.registers[memaddr + i] = value & 0xFF
+
+
+class TestIntConfig(unittest.TestCase):
+
+    FIELDS = 0xD5   # level, latch, clear, INT1 mode, INT mode
+
+    def int_conf(self, initial=0x00, **kwargs):
+        imu = FakeSh3001({Sh3001.SH3001_INT_CONF: initial})
+        imu.int_config(**kwargs)
+        return imu.registers[Sh3001.SH3001_INT_CONF]
+
+    def test_default(self):
+        # active high, pulse, cleared by the status read, push-pull
+        self.assertEqual(self.int_conf(0x00), 0x40 | 0x05)
+        self.assertEqual(self.int_conf(0xFF) & self.FIELDS, 0x40 | 0x05)
+
+    def test_push_pull(self):
+        self.assertEqual(self.int_conf(0x00, mode=Sh3001.SH3001_INT_INT_NORMAL) & 0x05, 0x05)
+
+    def test_open_drain(self):
+        value = self.int_conf(0xFF, mode=Sh3001.SH3001_INT_INT_OD)
+        self.assertEqual(value & 0x05, 0x00)
+        # the other fields are still set
+        self.assertEqual(value & self.FIELDS & 0xF0, 0x40)
+
+    def test_level_latch_clear(self):
+        value = self.int_conf(0x00, level=Sh3001.SH3001_INT_LEVEL_LOW, latch=Sh3001.SH3001_INT_LATCH,
+                              clear=Sh3001.SH3001_INT_CLEAR_ANY)
+        self.assertEqual(value & 0xF0, 0x80 | 0x10)
+
+    def test_other_bits_kept(self):
+        # bits 1, 3 and 5 are not INT_CONF fields
+        self.assertEqual(self.int_conf(0x2A, mode=Sh3001.SH3001_INT_INT_OD) & 0x2A, 0x2A)
+
+
+class TestIntEnable(unittest.TestCase):
+
+    def test_enable_and_map(self):
+        imu = FakeSh3001()
+        imu.int_enable(Sh3001.SH3001_INT_TAP | Sh3001.SH3001_INT_FREE_FALL, pin=Sh3001.SH3001_INT_MAP_INT1)
+        flags = Sh3001.SH3001_INT_TAP | Sh3001.SH3001_INT_FREE_FALL
+        enabled = imu.mem_read(2, Sh3001.SH3001_INT_ENABLE0)
+        pin_map = imu.mem_read(2, Sh3001.SH3001_INT_PIN_MAP0)
+        self.assertEqual((enabled[0] << 8) | enabled[1], flags)
+        self.assertEqual((pin_map[0] << 8) | pin_map[1], flags)
+
+        imu.int_enable(Sh3001.SH3001_INT_TAP, Sh3001.SH3001_INT_DISABLE)
+        enabled = imu.mem_read(2, Sh3001.SH3001_INT_ENABLE0)
+        self.assertEqual((enabled[0] << 8) | enabled[1], Sh3001.SH3001_INT_FREE_FALL)
+
+    def test_status(self):
+        imu = FakeSh3001({Sh3001.SH3001_INT_STA0: 0x01, Sh3001.SH3001_INT_STA0 + 1: 0x02})
+        self.assertEqual(imu.int_status(), 0x0102)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# python3 -m unittest discover -s test -p 'test_*.py'
+import unittest
+import numpy as np
+from pidog.trajectory import Trajectory, TimedFrame, retime
+
+KEYFRAMES = [[0, 10], [30, -20], [45, 0], [10, 40]]
+TIMES = [0.5, 1.0, 1.8, 2.0]
+
+
+class TestTrajectory(unittest.TestCase):
+
+    def check_keyframes(self, method):
+        trajectory = Trajectory(KEYFRAMES, TIMES, method=method)
+        for keyframe, t in zip(KEYFRAMES, TIMES):
+            np.testing.assert_allclose(trajectory.sample(t), keyframe, atol=1e-9)
+        np.testing.assert_allclose(trajectory.sample(TIMES), KEYFRAMES, atol=1e-9)
+
+    def check_clamped(self, method):
+        trajectory = Trajectory(KEYFRAMES, TIMES, method=method)
+        np.testing.assert_allclose(trajectory.sample(0.0), KEYFRAMES[0])
+        np.testing.assert_allclose(trajectory.sample(TIMES[-1] + 1), KEYFRAMES[-1])
+        # at rest at both ends
+        eps = 1e-4
+        np.testing.assert_allclose(trajectory.sample(TIMES[0] + eps), KEYFRAMES[0], atol=1e-2)
+        np.testing.assert_allclose(trajectory.sample(TIMES[-1] - eps), KEYFRAMES[-1], atol=1e-2)
+
+    def test_cubic_keyframes(self):
+        self.check_keyframes(Trajectory.CUBIC)
+
+    def test_min_jerk_keyframes(self):
+        self.check_keyframes(Trajectory.MIN_JERK)
+
+    def test_cubic_clamped(self):
+        self.check_clamped(Trajectory.CUBIC)
+
+    def test_min_jerk_clamped(self):
+        self.check_clamped(Trajectory.MIN_JERK)
+
+    def test_min_jerk_stops_at_keyframes(self):
+        trajectory = Trajectory(KEYFRAMES, TIMES, method=Trajectory.MIN_JERK)
+        eps = 1e-4
+        for keyframe, t in zip(KEYFRAMES[1:-1], TIMES[1:-1]):
+            np.testing.assert_allclose(trajectory.sample(t - eps), keyframe, atol=1e-2)
+            np.testing.assert_allclose(trajectory.sample(t + eps), keyframe, atol=1e-2)
+
+    def test_frames(self):
+        trajectory = Trajectory(KEYFRAMES, TIMES)
+        frames = trajectory.frames(50)
+        self.assertTrue(all(isinstance(f, TimedFrame) for f in frames))
+        self.assertEqual(len(frames), 76)
+        np.testing.assert_allclose(frames[0], KEYFRAMES[0])
+        np.testing.assert_allclose(frames[-1], KEYFRAMES[-1])
+        self.assertAlmostEqual(sum(f.duration for f in frames[1:]), trajectory.duration)
+
+    def test_bad_times(self):
+        with self.assertRaises(ValueError):
+            Trajectory(KEYFRAMES, [0, 1, 1, 2])
+        with self.assertRaises(ValueError):
+            Trajectory(KEYFRAMES, TIMES[:3])
+        with self.assertRaises(ValueError):
+            Trajectory(KEYFRAMES, TIMES, method='linear')
+
+
+class TestRetime(unittest.TestCase):
+
+    MAX_DPS = [400, 200, 300]
+    MAX_DPSS = [4000, 3000, 2000]
+
+    def check_limits(self, start, frames, timed):
+        p = np.vstack([start, frames])
+        durations = np.array([f.duration for f in timed])
+        v = np.diff(p, axis=0) / durations[:, None]
+        vmax = np.array(self.MAX_DPS)
+        amax = np.array(self.MAX_DPSS)
+        tol = 1e-6
+        self.assertTrue(np.all(np.abs(v) <= vmax * (1 + tol)))
+        # from rest, between frames over the mean duration, back to rest
+        self.assertTrue(np.all(np.abs(v[0]) <= amax * durations[0] * (1 + tol)))
+        spans = (durations[1:] + durations[:-1]) / 2
+        self.assertTrue(np.all(np.abs(np.diff(v, axis=0)) <= amax * spans[:, None] * (1 + tol) + tol))
+        self.assertTrue(np.all(np.abs(v[-1]) <= amax * durations[-1] * (1 + tol)))
+
+    def test_limits(self):
+        rng = np.random.default_rng(1)
+        for _ in range(5):
+            frames = rng.uniform(-60, 60, (20, 3))
+            start = [0, 0, 0]
+            timed, duration = retime(frames, self.MAX_DPS, self.MAX_DPSS, start)
+            self.assertEqual(len(timed), len(frames))
+            np.testing.assert_allclose(timed, frames)
+            self.assertAlmostEqual(duration, sum(f.duration for f in timed))
+            self.check_limits(start, frames, timed)
+
+    def test_velocity_bound(self):
+        # slow acceleration limits do not matter for a single long move at rest
+        timed, _ = retime([[40, 0, 0]], 400, 1e9, [0, 0, 0])
+        self.assertAlmostEqual(timed[0].duration, 40 / 400)
+
+    def test_holds(self):
+        frames = [[10, 0, 0], [10, 0, 0], [10, 0, 0], [20, 0, 0]]
+        # without hold_duration a hold between holds shrinks to min_duration
+        timed, _ = retime(frames, self.MAX_DPS, self.MAX_DPSS, [0, 0, 0])
+        self.assertAlmostEqual(timed[2].duration, 0.01)
+        timed, _ = retime(frames, self.MAX_DPS, self.MAX_DPSS, [0, 0, 0], hold_duration=0.5)
+        self.assertAlmostEqual(timed[1].duration, 0.5)
+        self.assertAlmostEqual(timed[2].duration, 0.5)
+        self.assertLess(timed[3].duration, 0.5)
+        self.check_limits([0, 0, 0], frames, timed)
+
+
+if __name__ == '__main__':
+    unittest.main()